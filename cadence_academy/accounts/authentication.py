@@ -0,0 +1,158 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULT_TOKEN_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+    'SHARED_CACHE_ALIAS': None,
+    # In-process lifetime when there is no shared tier to carry
+    # invalidations between processes.
+    'LOCAL_TIMEOUT': 5,
+}
+
+
+def _token_cache_setting(name):
+    return getattr(settings, 'TOKEN_CACHE', {}).get(name, DEFAULT_TOKEN_CACHE[name])
+
+
+class LRUCache:
+    """A small thread-safe LRU with a per-entry time to live."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.timeout if timeout is None else timeout), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_cache():
+    global _local_cache
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                _local_cache = LRUCache(
+                    _token_cache_setting('MAX_ENTRIES'),
+                    _token_cache_setting('TIMEOUT'),
+                )
+    return _local_cache
+
+
+def get_shared_cache():
+    alias = _token_cache_setting('SHARED_CACHE_ALIAS')
+    return caches[alias] if alias else None
+
+
+def _local_timeout(shared):
+    return _token_cache_setting('TIMEOUT' if shared is not None else 'LOCAL_TIMEOUT')
+
+
+def _shared_key(key):
+    return f'auth-token:{key}'
+
+
+def _generation_key(key):
+    return f'auth-token-generation:{key}'
+
+
+def invalidate_token(key):
+    get_local_cache().delete(key)
+    shared = get_shared_cache()
+    if shared is not None:
+        # Every process checks the generation on its in-process hits, so a
+        # new one retires their copies too. It outlives any copy cached
+        # before it was set.
+        shared.set(_generation_key(key), uuid.uuid4().hex, 2 * _token_cache_setting('TIMEOUT'))
+        shared.delete(_shared_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    from rest_framework.authtoken.models import Token
+
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+def clear_token_cache():
+    get_local_cache().clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers token -> user lookups.
+
+    Entries live in a bounded in-process LRU and, when TOKEN_CACHE sets
+    SHARED_CACHE_ALIAS, in that Django cache as well. Logout, password and
+    role changes invalidate entries through the signals in accounts.models.
+
+    With a shared tier, each entry is tagged with the token's generation in
+    the shared cache, which invalidation replaces, and in-process hits are
+    only used while the tag still matches. Without one, other processes
+    cannot be told, so in-process entries only live for LOCAL_TIMEOUT.
+    """
+
+    def authenticate_credentials(self, key):
+        local = get_local_cache()
+        shared = get_shared_cache()
+        generation = shared.get(_generation_key(key)) if shared is not None else None
+
+        entry = local.get(key)
+        if entry is None or entry[0] != generation:
+            entry = shared.get(_shared_key(key)) if shared is not None else None
+            if entry is not None and entry[0] == generation:
+                local.set(key, entry, _local_timeout(shared))
+            else:
+                entry = None
+        if entry is not None:
+            return pickle.loads(entry[1])
+
+        # The generation was read before the lookup, so an invalidation
+        # racing with it leaves this entry tagged as stale.
+        user, token = super().authenticate_credentials(key)
+        # Cache a pickled snapshot so every request works on its own copy
+        # of the user rather than sharing one mutable instance.
+        entry = (generation, pickle.dumps((user, token), pickle.HIGHEST_PROTOCOL))
+        local.set(key, entry, _local_timeout(shared))
+        if shared is not None:
+            shared.set(_shared_key(key), entry, _token_cache_setting('TIMEOUT'))
+        return user, token
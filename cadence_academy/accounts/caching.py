@@ -0,0 +1,86 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def get_response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(label):
+    return f'version:{label}'
+
+
+def _fresh_version():
+    # Taken from the clock so a version that was evicted and recreated never
+    # repeats one that cached responses may still be stored under.
+    return time.time_ns()
+
+
+def get_version(label):
+    cache = get_response_cache()
+    key = _version_key(label)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(label):
+    # A plain set of a new value rather than incr(): incr is a
+    # read-modify-write on the file-based cache, so two concurrent bumps
+    # could both write N+1 and lose one invalidation.
+    get_response_cache().set(_version_key(label), _fresh_version(), timeout=None)
+
+
+def bump_version_on_commit(label, using=None):
+    """
+    Bump ``label`` once the current transaction commits, or at once outside
+    one. Bumping earlier would let a concurrent request read the old rows
+    and cache them under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(label), using=using)
+
+
+class VersionedResponseCacheMixin:
+    """
+    Serves list/retrieve responses from the cache until one of
+    ``cache_models`` changes.
+
+    Each model has a version that save, delete and m2m_changed signals
+    replace once the change commits, so cache entries never need to be
+    deleted: a bump moves every reader to a new key. Authentication and
+    permission checks still run on every request. Views using it are not routed to read replicas: a
+    response built from a lagging replica would be cached under the new
+    version.
+    """
+    cache_models = ()
+    cache_timeout = 60 * 60
+
+    def get_cache_key(self, request):
+        versions = ':'.join(str(get_version(model._meta.label)) for model in self.cache_models)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'response:{type(self).__name__}:{versions}:{path}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_response_cache()
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
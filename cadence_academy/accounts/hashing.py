@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+
+DEFAULT_PASSWORD_HASHING = {
+    # Worker processes in the shared pool, started on first use.
+    'WORKERS': min(4, os.cpu_count() or 1),
+    # Below this many passwords the round trip to the pool outweighs the
+    # hashing itself, so they are hashed in the calling thread.
+    'PARALLEL_THRESHOLD': 64,
+    # Never "fork": forking a threaded web worker can copy held locks and
+    # open database connections into the children.
+    'START_METHOD': 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn',
+}
+
+
+def _hashing_setting(name):
+    return getattr(settings, 'PASSWORD_HASHING', {}).get(name, DEFAULT_PASSWORD_HASHING[name])
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers=None):
+    # One pool per process, kept for its lifetime so each registration does
+    # not pay for starting interpreters. ``workers`` only applies when the
+    # pool is started.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers or _hashing_setting('WORKERS'),
+                    mp_context=multiprocessing.get_context(_hashing_setting('START_METHOD')),
+                )
+    return _executor
+
+
+def _encode(job):
+    # Runs in a worker process. The hasher instance is pickled across, so
+    # the worker never needs Django settings or the app registry.
+    hasher, password, salt = job
+    return hasher.encode(password, salt)
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash ``passwords`` with the default hasher, spread over the shared process pool."""
+    hasher = get_hasher('default')
+    jobs = [(hasher, password, hasher.salt()) for password in passwords]
+    workers = workers or _hashing_setting('WORKERS')
+    if workers == 1 or len(jobs) < _hashing_setting('PARALLEL_THRESHOLD'):
+        return [_encode(job) for job in jobs]
+    return list(get_executor(workers).map(_encode, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
@@ -0,0 +1,36 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.onboarding import ONBOARDING_ROLES, bulk_register
+
+
+class Command(BaseCommand):
+    help = 'Register a roster of students or teachers from a CSV or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV with a header row, or a JSON list of objects. Columns: username, email, password, class_id (optional).')
+        parser.add_argument('--role', choices=ONBOARDING_ROLES, default='student')
+        parser.add_argument('--workers', type=int, default=None, help="Password hashing processes (default: PASSWORD_HASHING['WORKERS']).")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist.')
+
+        with path.open(newline='', encoding='utf-8') as handle:
+            if path.suffix.lower() == '.json':
+                rows = json.load(handle)
+            else:
+                rows = list(csv.DictReader(handle))
+        if not isinstance(rows, list):
+            raise CommandError('Expected a list of users.')
+
+        summary = bulk_register(rows, role=options['role'], workers=options['workers'])
+        if summary.errors:
+            for error in summary.errors:
+                self.stderr.write(f"row {error['row']}: {error['errors']}")
+            raise CommandError(f'{len(summary.errors)} invalid row(s); nothing was imported.')
+        self.stdout.write(self.style.SUCCESS(f"Registered {len(summary.users)} {options['role']}(s)."))
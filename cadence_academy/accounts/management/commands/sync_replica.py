@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cadence_academy.replicas import get_replicas, sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the read replicas (REPLICA_DATABASES).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='aliases', help='Replica alias to sync (default: all of them).')
+        parser.add_argument('--interval', type=float, default=0, help='Keep syncing every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        aliases = options['aliases'] or replicas
+        unknown = set(aliases) - set(replicas)
+        if unknown:
+            raise CommandError(f"Not a replica: {', '.join(sorted(unknown))}.")
+        if not aliases:
+            raise CommandError('No replicas configured; set CADENCE_REPLICA_PATHS.')
+
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                sync_replica(alias)
+                self.stdout.write(f'Synced {alias} in {(time.perf_counter() - started) * 1000:.0f} ms.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
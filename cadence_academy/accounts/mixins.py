@@ -0,0 +1,132 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from cadence_academy.instrumentation import SerializationTimingMixin
+
+
+def _query_param_set(request, name):
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+def field_requested(request, serializer_class, name):
+    """
+    Whether ``name`` will be rendered by ``serializer_class`` for this request.
+
+    Fields listed in the serializer's ``Meta.expandable_fields`` are only
+    rendered when named in ``?expand=``; ``?fields=`` then limits the output
+    to the fields it lists.
+    """
+    expandable = getattr(serializer_class.Meta, 'expandable_fields', ())
+    if name in expandable:
+        expand = _query_param_set(request, 'expand') or set()
+        if name not in expand:
+            return False
+    fields = _query_param_set(request, 'fields')
+    return fields is None or name in fields
+
+
+class DynamicFieldsMixin(SerializationTimingMixin):
+    """
+    Serializer mixin applying ?fields= and ?expand= to the top-level
+    serializer. Response serializers all use it, so it also brings them
+    under the request serialization timing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        for name in list(self.fields):
+            if not field_requested(request, type(self), name):
+                self.fields.pop(name)
+
+
+class RelatedFieldsQuerysetMixin:
+    """
+    View mixin that only joins or prefetches relations the response will render.
+
+    ``select_related_fields`` and ``prefetch_related_fields`` map serializer
+    field names to the relation lookups they need.
+    """
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        select = [
+            lookup for name, lookup in self.select_related_fields.items()
+            if field_requested(self.request, serializer_class, name)
+        ]
+        prefetch = [
+            lookup for name, lookup in self.prefetch_related_fields.items()
+            if field_requested(self.request, serializer_class, name)
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    ``get_validators()`` returns ``(last_modified, fingerprint)`` from a cheap
+    query, or None to skip conditional handling; it only runs when the client
+    sent If-None-Match or If-Modified-Since. When those still match, a 304 is
+    returned without loading or serializing any objects. Other responses get
+    their validators from ``response_validators()``, which may derive them
+    from what the handler already loaded. A None ``last_modified`` sends no
+    Last-Modified header.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        return None
+
+    def response_validators(self, request, response, *args, **kwargs):
+        return self.get_validators(request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = None
+        if 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            validators = self.get_validators(request, *args, **kwargs)
+        if validators is not None and get_conditional_response(
+            request, **self.validator_headers(request, validators),
+        ) is not None:
+            response = Response(status=304)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if validators is None:
+                validators = self.response_validators(request, response, *args, **kwargs)
+            if validators is None:
+                return response
+        headers = self.validator_headers(request, validators)
+        response['ETag'] = headers['etag']
+        if headers['last_modified'] is not None:
+            response['Last-Modified'] = http_date(headers['last_modified'])
+        return response
+
+    def validator_headers(self, request, validators):
+        last_modified, fingerprint = validators
+        digest = hashlib.md5(f'{request.get_full_path()}|{fingerprint}'.encode()).hexdigest()
+        return {
+            'etag': quote_etag(digest),
+            'last_modified': int(last_modified.timestamp()) if last_modified else None,
+        }
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
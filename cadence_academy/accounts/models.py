@@ -1,8 +1,24 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import DEFERRED
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .authentication import invalidate_token, invalidate_user_tokens
+from .caching import bump_version_on_commit
+from .thumbnails import schedule_thumbnails
+
+class CustomUserManager(UserManager):
+    def bulk_create_with_profiles(self, users, batch_size=None):
+        # bulk_create skips post_save, so create the matching profiles in one
+        # batched insert instead of one signal per user.
+        with transaction.atomic(using=self.db):
+            users = self.bulk_create(users, batch_size=batch_size)
+            Profile.objects.using(self.db).bulk_create(
+                [Profile(user=user) for user in users], batch_size=batch_size
+            )
+        return users
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -13,6 +29,25 @@ class CustomUser(AbstractUser):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='student')
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # Label -> storage name, filled in by accounts.thumbnails once generated.
+    profile_picture_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CustomUserManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_picture = instance.__dict__.get('profile_picture', DEFERRED)
+        return instance
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Role-filtered lists page by id: WHERE role = ? AND id > ? ORDER BY id.
+            models.Index(fields=['role', 'id'], name='user_role_id_idx'),
+            # Password reset and registration look users up by email.
+            models.Index(fields=['email'], name='user_email_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -38,6 +73,26 @@ class Profile(models.Model):
     address = models.CharField(max_length=255, blank=True, null=True)
     country = models.CharField(max_length=50, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changed(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(
+            value is not DEFERRED and getattr(self, name) != value
+            for name, value in loaded.items()
+        )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
 
     def __str__(self):
         return self.user.username
@@ -48,5 +103,54 @@ class Profile(models.Model):
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
-    instance.profile.save()
+        return
+    # Only write the profile if it was loaded through this user and edited;
+    # plain user saves (last_login, set_password, ...) leave it alone.
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None and profile.has_changed():
+        profile.save()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def process_profile_picture(sender, instance, created, **kwargs):
+    name = instance.profile_picture.name or ''
+    loaded = getattr(instance, '_loaded_picture', None)
+    instance._loaded_picture = name
+    if loaded is DEFERRED or (loaded or '') == name:
+        return
+    previous = instance.profile_picture_thumbnails
+    if previous:
+        CustomUser.objects.filter(pk=instance.pk).update(profile_picture_thumbnails={})
+        instance.profile_picture_thumbnails = {}
+    if name:
+        schedule_thumbnails(instance.pk, name, previous)
+    else:
+        for stale_name in previous.values():
+            transaction.on_commit(lambda stale_name=stale_name: default_storage.delete(stale_name))
+
+
+# Saves that can change who a token authenticates as, or whether it should.
+AUTH_FIELDS = {'password', 'role', 'is_active', 'username', 'email'}
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_tokens(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or AUTH_FIELDS & set(update_fields):
+        invalidate_user_tokens(instance.pk)
+
+@receiver(post_delete, sender='authtoken.Token')
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=Class)
+def bump_class_version(sender, using=None, **kwargs):
+    bump_version_on_commit(Class._meta.label, using)
 
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def bump_class_version_for_teacher(sender, instance, using=None, **kwargs):
+    # Deleting a teacher nulls Class.teacher with a bulk UPDATE that sends no
+    # Class signals.
+    bump_version_on_commit(Class._meta.label, using)
+    bump_version_on_commit('results.Class', using)
@@ -0,0 +1,130 @@
+from collections import namedtuple
+
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+
+from results.models import Class as SchoolClass
+from .hashing import hash_passwords
+from .models import CustomUser
+
+OnboardingSummary = namedtuple('OnboardingSummary', ['users', 'errors'])
+
+ONBOARDING_ROLES = ('student', 'teacher')
+
+_username_validator = UnicodeUsernameValidator()
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _existing(field, values):
+    size = connection.features.max_query_params or len(values) or 1
+    found = set()
+    for chunk in _chunks(values, size):
+        found.update(CustomUser.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return found
+
+
+def _clean_row(row):
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Expected an object.']}
+    cleaned, errors = {}, {}
+    for name in ('username', 'email', 'password'):
+        value = row.get(name)
+        if value in (None, ''):
+            errors[name] = ['This field is required.']
+        else:
+            cleaned[name] = str(value).strip() if name != 'password' else str(value)
+    if 'username' in cleaned:
+        try:
+            _username_validator(cleaned['username'])
+            if len(cleaned['username']) > 150:
+                raise ValidationError('Ensure this field has no more than 150 characters.')
+        except ValidationError as exc:
+            errors['username'] = exc.messages
+    if 'email' in cleaned:
+        try:
+            validate_email(cleaned['email'])
+        except ValidationError as exc:
+            errors['email'] = exc.messages
+    class_id = row.get('class_id')
+    if class_id not in (None, ''):
+        try:
+            cleaned['class_id'] = int(class_id)
+        except (TypeError, ValueError):
+            errors['class_id'] = ['A valid integer is required.']
+    return cleaned, errors
+
+
+def validate_roster(rows, role='student'):
+    cleaned, errors = {}, {}
+    for index, row in enumerate(rows):
+        row, row_errors = _clean_row(row)
+        if row_errors:
+            errors[index] = row_errors
+        else:
+            cleaned[index] = row
+
+    # Uniqueness and class existence are checked with one query per set of values.
+    taken_usernames = _existing('username', {row['username'] for row in cleaned.values()})
+    taken_emails = _existing('email', {row['email'] for row in cleaned.values()})
+    class_ids = {row['class_id'] for row in cleaned.values() if 'class_id' in row}
+    classes = set(SchoolClass.objects.filter(pk__in=class_ids).values_list('pk', flat=True)) if class_ids else set()
+
+    seen_usernames, seen_emails = {}, {}
+    for index, row in cleaned.items():
+        row_errors = {}
+        if row['username'] in taken_usernames:
+            row_errors['username'] = ['A user with that username already exists.']
+        elif row['username'] in seen_usernames:
+            row_errors['username'] = [f"Duplicate of row {seen_usernames[row['username']]}."]
+        if row['email'] in taken_emails:
+            row_errors['email'] = ['This field must be unique.']
+        elif row['email'] in seen_emails:
+            row_errors['email'] = [f"Duplicate of row {seen_emails[row['email']]}."]
+        if 'class_id' in row and role != 'student':
+            row_errors['class_id'] = ['Only students can be assigned to a class.']
+        elif 'class_id' in row and row['class_id'] not in classes:
+            row_errors['class_id'] = [f"Invalid pk \"{row['class_id']}\" - object does not exist."]
+        seen_usernames.setdefault(row['username'], index)
+        seen_emails.setdefault(row['email'], index)
+        if row_errors:
+            errors[index] = row_errors
+
+    return (
+        [row for index, row in cleaned.items() if index not in errors],
+        [{'row': index, 'errors': errors[index]} for index in sorted(errors)],
+    )
+
+
+def bulk_register(rows, role='student', workers=None, batch_size=1000):
+    """
+    Register a whole roster at once. Nothing is created unless every row is
+    valid; users, profiles and class memberships go in one transaction.
+    """
+    if role not in ONBOARDING_ROLES:
+        raise ValueError(f'role must be one of {", ".join(ONBOARDING_ROLES)}')
+
+    cleaned, errors = validate_roster(rows, role)
+    if errors:
+        return OnboardingSummary([], errors)
+
+    hashes = hash_passwords([row['password'] for row in cleaned], workers=workers)
+    users = [
+        CustomUser(username=row['username'], email=row['email'], role=role, password=password)
+        for row, password in zip(cleaned, hashes)
+    ]
+    Membership = SchoolClass.students.through
+    with transaction.atomic():
+        users = CustomUser.objects.bulk_create_with_profiles(users, batch_size=batch_size)
+        Membership.objects.bulk_create(
+            [Membership(class_id=row['class_id'], customuser_id=user.pk)
+             for row, user in zip(cleaned, users) if 'class_id' in row],
+            batch_size=batch_size,
+        )
+    return OnboardingSummary(users, [])
@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    # Keyset pagination on the primary key: each page is a range scan on the
+    # pk index starting from the cursor, so deep pages cost the same as the first.
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'MAX_PAGE_SIZE', 500)
+
+
+class NewestFirstCursorPagination(IdCursorPagination):
+    ordering = '-id'
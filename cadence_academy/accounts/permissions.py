@@ -1,9 +1,19 @@
-from rest_framework.permissions import BasePermission
+from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 class IsAdminUser(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.role == 'admin'
 
+class IsSelfOrAdmin(BasePermission):
+    # Reads are open to any signed-in user; only the user named by the URL's
+    # user_id, or an admin, may change it.
+    def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return False
+        if request.method in SAFE_METHODS:
+            return True
+        return request.user.role == 'admin' or str(request.user.pk) == str(view.kwargs.get('user_id'))
+
 class IsTeacherUser(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.role == 'teacher'
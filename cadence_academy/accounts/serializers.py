@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from rest_framework.validators import UniqueValidator
 from .models import Profile, CustomUser, Class
+from .mixins import DynamicFieldsMixin
 
 # User = get_user_model()
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ('bio', 'address', 'country', 'date_of_birth', 'user' )
@@ -31,12 +33,12 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user.save()
         return user
     
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'email', 'role'] 
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Class
         fields = ('id', 'name', 'teacher')
@@ -115,13 +117,14 @@ class AdminRegistrationSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(required=False)  # Ensure profile data is not required
     role = serializers.CharField(required=False)  # Ensure role is not required
+    thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = ('username', 'email', 'bio', 'profile_picture', 'role', 'profile')
+        fields = ('username', 'email', 'bio', 'profile_picture', 'thumbnails', 'role', 'profile')
         extra_kwargs = {
             'username': {'required': False},
             'email': {'required': False},
@@ -131,8 +134,21 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'class_id': {'required': False},
         }
 
+    def get_thumbnails(self, obj):
+        # Label -> URL; empty until the background worker has made them.
+        request = self.context.get('request')
+        urls = {}
+        for label, name in obj.profile_picture_thumbnails.items():
+            url = default_storage.url(name)
+            urls[label] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', {})
+        # Only admins change roles; anyone else editing a profile keeps theirs.
+        request = self.context.get('request')
+        if request is None or getattr(request.user, 'role', None) != 'admin':
+            validated_data.pop('role', None)
 
         # Update CustomUser fields
         for attr, value in validated_data.items():
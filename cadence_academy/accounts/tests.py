@@ -1,8 +1,24 @@
+import importlib
+import io
+import os
+import tempfile
+from unittest import mock
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.urls import clear_url_caches, reverse
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from cadence_academy import urls as project_urls
+from results.models import Class as SchoolClass
+from .authentication import clear_token_cache, get_local_cache, invalidate_user_tokens
+from .hashing import hash_passwords
 from .models import Profile
 
 User = get_user_model()
@@ -28,4 +44,380 @@ class AdminProfileTests(APITestCase):
         self.assertEqual(response.data['country'], 'Testland')
         self.assertEqual(response.data['date_of_birth'], '2000-01-01')
 
-# Create your tests here.
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        clear_token_cache()
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='password123', role='admin')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('teacher-list')
+
+    def test_repeat_requests_skip_token_lookup(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertFalse(any('authtoken_token' in q['sql'] for q in queries))
+
+    def test_logout_invalidates_token(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 204)
+        self.assertIsNone(get_local_cache().get(self.token.key))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_token(self):
+        self.client.get(self.url)
+        response = self.client.post(reverse('password_change'), {'old_password': 'password123', 'new_password': 'newpassword456'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_local_cache().get(self.token.key))
+
+    def test_role_change_takes_effect(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.user.role = 'student'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_last_login_update_keeps_entry(self):
+        self.client.get(self.url)
+        self.user.save(update_fields=['last_login'])
+        self.assertIsNotNone(get_local_cache().get(self.token.key))
+
+    @override_settings(TOKEN_CACHE={'SHARED_CACHE_ALIAS': 'default'})
+    def test_invalidation_in_another_process_retires_local_entries(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        stale = get_local_cache().get(self.token.key)
+        # Another process demotes the user: its signal clears its own
+        # in-process entry and the shared tier, but not this process's.
+        User.objects.filter(pk=self.user.pk).update(role='student')
+        invalidate_user_tokens(self.user.pk)
+        get_local_cache().set(self.token.key, stale)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(any('authtoken_token' in q['sql'] for q in queries))
+
+    @override_settings(TOKEN_CACHE={'LOCAL_TIMEOUT': 0})
+    def test_unshared_entries_use_the_local_timeout(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertTrue(any('authtoken_token' in q['sql'] for q in queries))
+
+
+class ProfileSignalTests(APITestCase):
+    def test_profile_created_once(self):
+        user = User.objects.create(username='signal', email='signal@example.com')
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+    def test_plain_user_saves_skip_profile(self):
+        user = User.objects.create(username='signal', email='signal@example.com')
+        user = User.objects.get(pk=user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_login'])
+            user.first_name = 'Ada'
+            user.save()
+        self.assertFalse(any('accounts_profile' in q['sql'] for q in queries))
+
+    def test_edited_profile_is_saved_with_user(self):
+        user = User.objects.select_related('profile').get(
+            pk=User.objects.create(username='signal', email='signal@example.com').pk
+        )
+        user.save()
+        user.profile.country = 'Ghana'
+        user.save()
+        self.assertEqual(Profile.objects.get(user=user).country, 'Ghana')
+
+    def test_bulk_create_with_profiles(self):
+        users = User.objects.bulk_create_with_profiles(
+            [User(username=f'bulk{i}', email=f'bulk{i}@example.com') for i in range(5)]
+        )
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 5)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkRegistrationTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@example.com', role='admin')
+        self.school_class = SchoolClass.objects.create(name='JSS1')
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('register-bulk')
+
+    def test_registers_roster_with_profiles_and_classes(self):
+        rows = [
+            {'username': f'pupil{i}', 'email': f'pupil{i}@example.com', 'password': 'secret123', 'class_id': self.school_class.pk}
+            for i in range(20)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'role': 'student', 'users': rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 20)
+        self.assertLess(len(queries), 15)
+
+        pupil = User.objects.get(username='pupil3')
+        self.assertEqual(pupil.role, 'student')
+        self.assertTrue(pupil.check_password('secret123'))
+        self.assertTrue(Profile.objects.filter(user=pupil).exists())
+        self.assertEqual(self.school_class.students.count(), 20)
+
+    def test_rejects_duplicates_without_creating_anyone(self):
+        rows = [
+            {'username': 'admin', 'email': 'new@example.com', 'password': 'x'},
+            {'username': 'fresh', 'email': 'fresh@example.com', 'password': 'x'},
+            {'username': 'fresh2', 'email': 'fresh@example.com', 'password': 'x'},
+            {'username': 'bad name!', 'email': 'not-an-email', 'password': ''},
+        ]
+        response = self.client.post(self.url, {'users': rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [0, 2, 3])
+        self.assertEqual(set(response.data['errors'][2]['errors']), {'username', 'email', 'password'})
+        self.assertFalse(User.objects.filter(username='fresh').exists())
+
+    def test_rejects_a_body_that_is_not_an_object(self):
+        for body in ([{'username': 'pupil', 'email': 'pupil@example.com', 'password': 'x'}], 'users', 3):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+            self.assertIn('detail', response.data)
+        self.assertFalse(User.objects.filter(username='pupil').exists())
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(user=User.objects.create(username='pupil', email='pupil@example.com'))
+        response = self.client.post(self.url, {'users': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_roster_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as roster:
+            roster.write('username,email,password\nteach1,teach1@example.com,secret\nteach2,teach2@example.com,secret\n')
+        self.addCleanup(os.remove, roster.name)
+        call_command('import_roster', roster.name, '--role', 'teacher', stdout=open(os.devnull, 'w'))
+        self.assertEqual(User.objects.filter(role='teacher').count(), 2)
+
+    def test_parallel_hashes_verify(self):
+        hashes = hash_passwords(['secret'] * 80, workers=2)
+        self.assertEqual(len(set(hashes)), 80)
+        self.assertTrue(User(password=hashes[-1]).check_password('secret'))
+
+    def test_small_batches_skip_the_pool(self):
+        with mock.patch('accounts.hashing.get_executor') as get_executor:
+            hashes = hash_passwords(['secret'] * 10, workers=2)
+        get_executor.assert_not_called()
+        self.assertTrue(User(password=hashes[0]).check_password('secret'))
+
+
+def jpeg_upload(name='photo.jpg', size=(1600, 1200)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 40, 90)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ProfilePictureThumbnailTests(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        overrides = override_settings(
+            MEDIA_ROOT=media.name,
+            THUMBNAILS={'SIZES': {'small': 64, 'medium': 256}, 'SYNC': True},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create(username='pictured', email='pictured@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('profile_detail', kwargs={'user_id': self.user.pk})
+
+    def upload(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {'profile_picture': jpeg_upload(**kwargs)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        return response
+
+    def test_upload_generates_thumbnails_by_size(self):
+        self.upload()
+        thumbnails = self.user.profile_picture_thumbnails
+        self.assertEqual(set(thumbnails), {'small', 'medium'})
+        for label, edge in (('small', 64), ('medium', 256)):
+            with Image.open(os.path.join(self.media_root, thumbnails[label])) as image:
+                self.assertEqual(max(image.size), edge)
+                self.assertEqual(image.format, 'JPEG')
+
+        response = self.client.get(self.url)
+        self.assertTrue(response.data['thumbnails']['small'].endswith(thumbnails['small']))
+        self.assertTrue(response.data['thumbnails']['small'].startswith('http://testserver/media/'))
+
+    def test_thumbnails_are_generated_after_the_response(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.patch(self.url, {'profile_picture': jpeg_upload()}, format='multipart')
+        self.assertEqual(response.data['thumbnails'], {})
+        self.assertEqual(len(callbacks), 1)
+
+    def test_replacing_the_picture_removes_old_thumbnails(self):
+        self.upload(name='first.jpg')
+        old = list(self.user.profile_picture_thumbnails.values())
+        self.upload(name='second.jpg', size=(300, 900))
+        self.assertTrue(all('second' in name for name in self.user.profile_picture_thumbnails.values()))
+        for name in old:
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, name)))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_password_change_after_upload_keeps_thumbnails(self):
+        clear_token_cache()
+        self.user.set_password('password123')
+        self.user.save()
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(self.url, {'profile_picture': jpeg_upload()}, format='multipart')
+        # A request served while the thumbnails are generated caches the
+        # user without them.
+        self.client.get(self.url)
+        for callback in callbacks:
+            callback()
+        self.user.refresh_from_db()
+        thumbnails = self.user.profile_picture_thumbnails
+        self.assertTrue(thumbnails)
+
+        response = self.client.post(
+            reverse('password_change'), {'old_password': 'password123', 'new_password': 'newpassword456'}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_picture_thumbnails, thumbnails)
+        self.assertTrue(self.user.check_password('newpassword456'))
+
+    def test_unreadable_upload_is_rejected(self):
+        upload = SimpleUploadedFile('fake.jpg', b'not an image', content_type='image/jpeg')
+        response = self.client.patch(self.url, {'profile_picture': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class ProfileUpdatePermissionTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='student_a', email='a@example.com', role='student')
+        self.other = User.objects.create(username='student_b', email='b@example.com', role='student')
+        self.admin = User.objects.create(username='admin_c', email='c@example.com', role='admin')
+
+    def patch(self, user, target, data):
+        self.client.force_authenticate(user=user)
+        return self.client.patch(reverse('profile_detail', kwargs={'user_id': target.pk}), data, format='json')
+
+    def test_users_cannot_edit_other_profiles(self):
+        response = self.patch(self.student, self.other, {'role': 'admin', 'email': 'evil@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.role, self.other.email), ('student', 'b@example.com'))
+        # Reading stays open.
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(reverse('profile_detail', kwargs={'user_id': self.other.pk})).status_code, status.HTTP_200_OK)
+
+    def test_only_admins_change_roles(self):
+        response = self.patch(self.student, self.student, {'role': 'admin', 'bio': 'Hello'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.role, self.student.bio), ('student', 'Hello'))
+
+        response = self.patch(self.admin, self.other, {'role': 'teacher'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.role, 'teacher')
+
+
+class MediaServingTests(TestCase):
+    content = bytes(range(256)) * 8
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = os.path.abspath(media.name)
+        os.makedirs(os.path.join(media.name, 'profile_pictures'))
+        with open(os.path.join(media.name, 'profile_pictures', 'me.jpg'), 'wb') as handle:
+            handle.write(self.content)
+        overrides = override_settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.url = '/media/profile_pictures/me.jpg'
+        self.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='secret')
+        self.client.force_login(self.user)
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_file_with_validators_and_cache_headers(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=2592000', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_conditional_requests_are_not_modified(self):
+        response, _ = self.get()
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=modified)[0].status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"')[0].status_code, 200)
+
+    def test_byte_ranges(self):
+        response, body = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response, body = self.get(HTTP_RANGE='bytes=-5')
+        self.assertEqual(body, self.content[-5:])
+        response, body = self.get(HTTP_RANGE='bytes=2000-')
+        self.assertEqual(body, self.content[2000:])
+
+        response, _ = self.get(HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"older"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        etag = response['ETag']
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_paths_outside_media_root_are_not_found(self):
+        for url in ('/media/../manage.py', '/media/%2e%2e/manage.py', '/media/profile_pictures/', '/media/missing.jpg'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+        token = Token.objects.create(user=self.user)
+        response, body = self.get(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(body, self.content)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Token wrong')[0].status_code, 401)
+
+    def test_not_mounted_outside_debug_unless_enabled(self):
+        self.addCleanup(clear_url_caches)
+        self.addCleanup(importlib.reload, project_urls)
+        with self.settings(DEBUG=False, MEDIA_SERVING={'ENABLED': False}):
+            clear_url_caches()
+            importlib.reload(project_urls)
+            self.assertEqual(self.get()[0].status_code, 404)
+
+    def test_offload_to_front_end_server(self):
+        with self.settings(MEDIA_SERVING={'ACCEL_HEADER': 'X-Accel-Redirect', 'ACCEL_PREFIX': '/protected/'}):
+            response, body = self.get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/profile_pictures/me.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('ETag', response)
+
+        with self.settings(MEDIA_SERVING={'ACCEL_HEADER': 'X-Sendfile'}):
+            response, _ = self.get()
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'profile_pictures', 'me.jpg'))
@@ -0,0 +1,131 @@
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .authentication import invalidate_user_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THUMBNAILS = {
+    # Label -> longest edge in pixels.
+    'SIZES': {'small': 64, 'medium': 256, 'large': 512},
+    'FORMAT': 'JPEG',
+    'QUALITY': 82,
+    'WORKERS': 2,
+    # Generate in the request thread instead of the pool (tests, scripts).
+    'SYNC': False,
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def _thumbnail_setting(name):
+    return getattr(settings, 'THUMBNAILS', {}).get(name, DEFAULT_THUMBNAILS[name])
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Threads rather than processes: Pillow releases the GIL while decoding,
+    # resizing and encoding, and threads share the web worker's settings.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_thumbnail_setting('WORKERS'), thread_name_prefix='thumbnails',
+                )
+    return _executor
+
+
+def thumbnail_name(name, label):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    extension = EXTENSIONS[_thumbnail_setting('FORMAT')]
+    return posixpath.join(directory, 'thumbnails', f'{stem}_{label}.{extension}')
+
+
+def render_thumbnails(source):
+    """Resize and re-encode an open image file. Returns ``{label: bytes}``."""
+    sizes = _thumbnail_setting('SIZES')
+    image_format = _thumbnail_setting('FORMAT')
+    with Image.open(source) as image:
+        # JPEG can decode straight at a reduced scale, which is most of the
+        # saving for large phone photos.
+        largest = max(sizes.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        rendered = {}
+        for label, edge in sorted(sizes.items(), key=lambda item: -item[1]):
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, quality=_thumbnail_setting('QUALITY'), optimize=True)
+            rendered[label] = buffer.getvalue()
+    return rendered
+
+
+def generate_thumbnails(user_id, name, previous=None):
+    """
+    Build the thumbnails for ``name`` and record them on the user, unless the
+    user has uploaded a different picture in the meantime.
+    """
+    from .models import CustomUser
+
+    try:
+        with default_storage.open(name) as source:
+            rendered = render_thumbnails(source)
+        thumbnails = {}
+        for label, content in rendered.items():
+            target = thumbnail_name(name, label)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            thumbnails[label] = default_storage.save(target, ContentFile(content))
+
+        updated = CustomUser.objects.filter(pk=user_id, profile_picture=name).update(
+            profile_picture_thumbnails=thumbnails, updated_at=timezone.now(),
+        )
+        if updated:
+            # update() sends no post_save, so drop cached token snapshots of
+            # the user by hand.
+            invalidate_user_tokens(user_id)
+            stale = [old for old in (previous or {}).values() if old not in thumbnails.values()]
+        else:
+            # A newer upload replaced this picture while we worked.
+            stale = list(thumbnails.values())
+        for stale_name in stale:
+            default_storage.delete(stale_name)
+    except Exception:
+        logger.exception('Could not generate thumbnails for %s', name)
+
+
+def _generate_in_worker(user_id, name, previous):
+    try:
+        generate_thumbnails(user_id, name, previous)
+    finally:
+        # Pool threads open their own database connections.
+        connections.close_all()
+
+
+def schedule_thumbnails(user_id, name, previous=None):
+    """Queue thumbnail generation for after the current transaction commits."""
+    def submit():
+        if _thumbnail_setting('SYNC'):
+            generate_thumbnails(user_id, name, previous)
+        else:
+            get_executor().submit(_generate_in_worker, user_id, name, previous)
+
+    transaction.on_commit(submit)
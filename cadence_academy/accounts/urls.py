@@ -1,11 +1,12 @@
 from django.urls import path
-from .views import  CustomObtainAuthToken, LogoutView, AdminProfileDetailView, UserProfileDetailView, PasswordChangeView, PasswordResetRequestView, PasswordResetConfirmView,  RegisterTeacherView, RegisterStudentView, RegisterAdminView, ClassCreateView, ClassListView, ClassDetailView, ClassUpdateView, ClassDeleteView, TeacherListView, StudentListView
+from .views import  CustomObtainAuthToken, LogoutView, AdminProfileDetailView, UserProfileDetailView, PasswordChangeView, PasswordResetRequestView, PasswordResetConfirmView,  RegisterTeacherView, RegisterStudentView, RegisterAdminView, BulkRegisterView, ClassCreateView, ClassListView, ClassDetailView, ClassUpdateView, ClassDeleteView, TeacherListView, StudentListView
 
 urlpatterns = [
     # path('register/', UserRegistrationView.as_view(), name='register'), Take this part to the import just in case I am returning back to it: UserRegistrationView,
     path('register/teacher/', RegisterTeacherView.as_view(), name='register-teacher'),
     path('register/student/', RegisterStudentView.as_view(), name='register-student'),
     path('register/admin/', RegisterAdminView.as_view(), name='register-admin'),
+    path('register/bulk/', BulkRegisterView.as_view(), name='register-bulk'),
     path('login/', CustomObtainAuthToken.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('admin/profile-detail/<int:user_id>/', AdminProfileDetailView.as_view(), name='admin_profile_detail'),
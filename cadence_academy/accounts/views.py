@@ -11,8 +11,11 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from .models import Profile, CustomUser, Class
 from rest_framework import status, generics
-from .permissions import IsAdminUser, IsTeacherUser, IsStudentUser
+from .permissions import IsAdminUser, IsSelfOrAdmin, IsTeacherUser, IsStudentUser
 from rest_framework.decorators import api_view
+from .onboarding import ONBOARDING_ROLES, bulk_register
+from .caching import VersionedResponseCacheMixin
+from .mixins import ConditionalGetMixin
 
 User = CustomUser
 
@@ -28,15 +31,17 @@ class ClassCreateView(generics.CreateAPIView):
     serializer_class = ClassSerializer
     permission_classes = [IsAdminUser] 
 
-class ClassListView(generics.ListAPIView):
+class ClassListView(VersionedResponseCacheMixin, generics.ListAPIView):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     permission_classes = [permissions.IsAuthenticated]  
+    cache_models = (Class,)
 
-class ClassDetailView(generics.RetrieveAPIView):
+class ClassDetailView(VersionedResponseCacheMixin, generics.RetrieveAPIView):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     permission_classes = [permissions.IsAuthenticated] 
+    cache_models = (Class,)
 
 class ClassUpdateView(generics.UpdateAPIView):
     queryset = Class.objects.all()
@@ -55,6 +60,7 @@ class RegisterTeacherView(generics.CreateAPIView):
 class TeacherListView(generics.ListAPIView):
     serializer_class = CustomUserSerializer
     permission_classes = [IsAdminUser]  
+    use_read_replica = True
 
     def get_queryset(self):
         return CustomUser.objects.filter(role='teacher')
@@ -62,6 +68,7 @@ class TeacherListView(generics.ListAPIView):
 class StudentListView(generics.ListAPIView):
     serializer_class = CustomUserSerializer
     permission_classes = [IsAdminUser]
+    use_read_replica = True
 
     def get_queryset(self):
         return CustomUser.objects.filter(role='student')
@@ -74,6 +81,28 @@ class RegisterAdminView(generics.CreateAPIView):
     serializer_class = AdminRegistrationSerializer
     permission_classes = [permissions.AllowAny]
 
+class BulkRegisterView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        # Body: {"role": "student" | "teacher", "users": [{username, email, password, class_id?}, ...]}
+        if not isinstance(request.data, dict):
+            return Response({'detail': 'Expected an object with a "users" list.'}, status=status.HTTP_400_BAD_REQUEST)
+        role = request.data.get('role', 'student')
+        rows = request.data.get('users')
+        if role not in ONBOARDING_ROLES:
+            return Response({'role': f'Must be one of: {", ".join(ONBOARDING_ROLES)}.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(rows, list):
+            return Response({'users': 'Expected a list of users.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = bulk_register(rows, role=role)
+        if summary.errors:
+            return Response({'errors': summary.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'created': len(summary.users), 'users': [{'id': user.pk, 'username': user.username} for user in summary.users]},
+            status=status.HTTP_201_CREATED,
+        )
+
 # Login View
 class CustomObtainAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
@@ -109,23 +138,44 @@ class AdminProfileDetailView(generics.RetrieveUpdateAPIView):
         return Profile.objects.get(user__id=user_id)
 
 # User Profile View (Any authenticated user can view and update their profile)
-class UserProfileDetailView(generics.RetrieveUpdateAPIView):
+class UserProfileDetailView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     queryset = Profile.objects.all()
     serializer_class = UserProfileSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsSelfOrAdmin]
     lookup_field = 'id'
+    use_read_replica = True
 
 
 
     def get_object(self):
         user_id = self.kwargs.get('user_id')
-        return get_object_or_404(Profile, user__id=user_id)
+        return get_object_or_404(Profile.objects.select_related('user'), user__id=user_id)
+
+    def get_validators(self, request, *args, **kwargs):
+        row = Profile.objects.filter(user__id=kwargs.get('user_id')).values_list('updated_at', 'user__updated_at').first()
+        if row is None:
+            return None
+        last_modified = max(row)
+        return last_modified, f'{row[0].isoformat()}:{row[1].isoformat()}'
 
     def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(self.retrieve_profile, request, *args, **kwargs)
+
+    def retrieve_profile(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def update(self, request, *args, **kwargs):
+        # The serializer describes the user, so edit the profile's user (and
+        # through it the nested profile), as retrieve does. Picture uploads
+        # arrive as multipart; thumbnails are generated after the response.
+        instance = self.get_object().user
+        serializer = self.get_serializer(instance, data=request.data, partial=kwargs.pop('partial', False))
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
 # Password Change View
 class PasswordChangeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -139,8 +189,9 @@ class PasswordChangeView(APIView):
             if not request.user.check_password(old_password):
                 return Response({"old_password": "Wrong password."}, status=400)
 
+            # request.user may be a cached snapshot; write the password alone.
             request.user.set_password(new_password)
-            request.user.save()
+            request.user.save(update_fields=['password'])
             return Response({"detail": "Password has been changed."})
         return Response(serializer.errors, status=400)
     
@@ -148,12 +199,14 @@ class PasswordChangeView(APIView):
 
 @api_view(['PATCH'])
 def update_profile(request, user_id):
+    if request.user.role != 'admin' and request.user.pk != user_id:
+        return Response(status=status.HTTP_403_FORBIDDEN)
     try:
         user = CustomUser.objects.get(id=user_id)
     except CustomUser.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    serializer = UserProfileSerializer(user, data=request.data, partial=True)
+    serializer = UserProfileSerializer(user, data=request.data, partial=True, context={'request': request})
     if serializer.is_valid():
         serializer.save()
         return Response(serializer.data)
@@ -0,0 +1,86 @@
+"""
+Compare two benchmarks.load reports, e.g. from two commits.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Prints p50/p95 latency, throughput and query counts side by side and marks
+changes worse than --threshold percent. With --fail-on-regression the exit
+status is 1 if any scenario regressed, for use in CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# (metric, label, higher is better)
+METRICS = [
+    ('p50_ms', 'p50 ms', False),
+    ('p95_ms', 'p95 ms', False),
+    ('throughput_rps', 'req/s', True),
+    ('errors', 'errors', False),
+]
+
+
+def _change(before, after):
+    if before == after:
+        return 0.0
+    if not before:
+        return float('inf')
+    return (after - before) / before * 100
+
+
+def _metrics(entry):
+    values = {metric: entry.get(metric) for metric, _, _ in METRICS}
+    if 'queries' in entry:
+        values['queries'] = entry['queries']['p50']
+    return values
+
+
+def compare(before, after, threshold):
+    """Return ``(rows, regressions)``; each row is (phase, scenario, label, before, after, change, regressed)."""
+    rows, regressions = [], []
+    metrics = METRICS + [('queries', 'queries', False)]
+    for phase in ('in_process', 'http'):
+        for scenario in sorted(set(before.get(phase, {})) & set(after.get(phase, {}))):
+            old, new = _metrics(before[phase][scenario]), _metrics(after[phase][scenario])
+            for metric, label, higher_is_better in metrics:
+                if old.get(metric) is None or new.get(metric) is None:
+                    continue
+                change = _change(old[metric], new[metric])
+                worse = -change if higher_is_better else change
+                # Query counts and errors are exact, so any increase counts.
+                regressed = worse > 0 if metric in ('queries', 'errors') else worse > threshold
+                rows.append((phase, scenario, label, old[metric], new[metric], change, regressed))
+                if regressed:
+                    regressions.append(f'{phase} {scenario} {label}')
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent change treated as a regression.')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    for key in ('dataset', 'profile', 'concurrency'):
+        if before['meta'].get(key) != after['meta'].get(key):
+            print(f'warning: {key} differs ({before["meta"].get(key)} vs {after["meta"].get(key)})')
+
+    print(f'{before["meta"].get("commit") or args.before} -> {after["meta"].get("commit") or args.after}')
+    rows, regressions = compare(before, after, args.threshold)
+    for phase, scenario, label, old, new, change, regressed in rows:
+        marker = '  <-- regression' if regressed else ''
+        print(f'{phase:>10} {scenario:<16} {label:>8}: {old:>10} -> {new:>10} ({change:+.1f}%){marker}')
+
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.threshold:g}%')
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Deterministic school datasets for the end-to-end benchmarks.
+
+The sizes are results.seeding's presets and the data comes from the same
+generator as `manage.py seed_school`, so a name and seed always produce the
+same users, classes, rosters and scores and reports taken on different
+commits measure the same data. Every user's password is PASSWORD.
+"""
+from collections import namedtuple
+
+DATASETS = ('small', 'medium', 'large')
+
+School = namedtuple('School', ['name', 'size', 'admins', 'teachers', 'students', 'subjects', 'classes'])
+
+PASSWORD = 'bench-password'
+
+
+def build_school(name, seed=2024):
+    """Load dataset ``name`` into the default database and return the ids created."""
+    from results.seeding import SCHOOL_SIZES, seed_school
+
+    size = SCHOOL_SIZES[name]
+    school = seed_school(size, seed=seed, password=PASSWORD)
+    return School(name, size, school.admins, school.teachers, school.students, school.subjects, school.classes)
@@ -0,0 +1,67 @@
+"""
+Time results.analytics over a whole term's result sheet, split into the
+grouped database read and the summary computed from it.
+
+    python -m benchmarks.grade_analytics --results 1000000
+
+Runs against a scratch SQLite file; db.sqlite3 is never touched.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from .utils import setup_django, timed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--results', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--json', help='Also write the report to this file.')
+    args = parser.parse_args(argv)
+
+    db_path = Path(tempfile.mkstemp(suffix='.sqlite3')[1])
+    setup_django(db_path)
+
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from results import analytics
+    from results.models import Result
+    from .index_plan import seed
+
+    try:
+        call_command('migrate', verbosity=0)
+        print(f'Seeding {args.users} users and {args.results} results ...')
+        with transaction.atomic(), connection.cursor() as cursor:
+            seed(cursor, args.users, args.results, random.Random(args.seed))
+
+        queryset = Result.objects.all()
+        values, counts = analytics.fetch_distribution(queryset)
+        report = {
+            'results': int(sum(counts)),
+            'distinct_totals': len(values),
+            'backend': 'numpy' if analytics.np is not None else 'python',
+            'fetch_ms': round(timed(lambda: analytics.fetch_distribution(queryset), args.repeat), 1),
+            'describe_ms': round(timed(lambda: analytics.describe(values, counts), args.repeat), 1),
+        }
+        started = time.perf_counter()
+        summary = analytics.result_statistics(queryset)
+        report['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    finally:
+        connection.close()
+        db_path.unlink(missing_ok=True)
+
+    print(f"{report['results']} results ({report['backend']}): fetch {report['fetch_ms']} ms, "
+          f"describe {report['describe_ms']} ms, end to end {report['total_ms']} ms")
+    print(f"mean {summary['mean']}, median {summary['median']}, pass rate {summary['pass_rate']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Query plans and timings for the user/result access patterns, before and
+after the index migrations (accounts 0007, results 0004).
+
+    python -m benchmarks.index_plan --users 500000 --results 5000000
+
+Runs against a scratch SQLite file; db.sqlite3 is never touched.
+"""
+import argparse
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from .utils import setup_django, timed
+
+BEFORE = [('accounts', '0006_updated_at'), ('results', '0003_result_updated_at')]
+AFTER = [('accounts', '0007_user_indexes'), ('results', '0004_result_date_recorded_index')]
+
+SUBJECTS = 20
+CLASS_SIZE = 30
+START = datetime(2022, 9, 1, tzinfo=dt_timezone.utc)
+DAYS = 3 * 365
+
+
+def migrate_to(targets):
+    from django.core.management import call_command
+
+    for app_label, name in targets:
+        call_command('migrate', app_label, name, verbosity=0)
+
+
+def seed(cursor, users, results, rng):
+    now = datetime.now(dt_timezone.utc).isoformat()
+    # Roles are scattered across the id range, as they are after years of
+    # mixed registrations: about 1% teachers and 0.1% admins.
+    roles = ['admin' if r < 0.001 else 'teacher' if r < 0.011 else 'student' for r in (rng.random() for _ in range(users))]
+    roles[0], roles[1] = 'admin', 'teacher'
+
+    cursor.executemany(
+        'INSERT INTO accounts_customuser (password, is_superuser, username, first_name, last_name, email, '
+        'is_staff, is_active, date_joined, role, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+        (('!', False, f'user{i}', '', '', f'user{i}@example.com', False, True, now, role, now)
+         for i, role in enumerate(roles, start=1)),
+    )
+    cursor.executemany(
+        'INSERT INTO results_subject (name, code, updated_at) VALUES (%s, %s, %s)',
+        [(f'Subject {i}', f'SUB{i:03d}', now) for i in range(SUBJECTS)],
+    )
+
+    teachers = [i for i, role in enumerate(roles, start=1) if role == 'teacher']
+    students = [i for i, role in enumerate(roles, start=1) if role == 'student']
+    classes = max(1, len(students) // CLASS_SIZE)
+    cursor.executemany(
+        'INSERT INTO results_class (name, teacher_id) VALUES (%s, %s)',
+        [(f'Class {i}', teachers[i % len(teachers)]) for i in range(classes)],
+    )
+    cursor.executemany(
+        'INSERT INTO results_class_students (class_id, customuser_id) VALUES (%s, %s)',
+        [(1 + (index % classes), student) for index, student in enumerate(students)],
+    )
+
+    per_student = min(SUBJECTS, max(1, results // len(students)))
+
+    def result_rows():
+        written = 0
+        for student in students:
+            for subject in rng.sample(range(1, SUBJECTS + 1), per_student):
+                if written >= results:
+                    return
+                first, second, exam = rng.randint(0, 20), rng.randint(0, 20), rng.randint(0, 60)
+                total = first + second + exam
+                grade = 'A' if total >= 90 else 'B' if total >= 80 else 'C' if total >= 70 else 'D' if total >= 60 else 'F'
+                recorded = (START + timedelta(days=rng.randrange(DAYS), seconds=rng.randrange(86400))).isoformat()
+                written += 1
+                yield (student, subject, first, second, exam, total, grade, recorded, recorded)
+
+    cursor.executemany(
+        'INSERT INTO results_result (student_id, subject_id, first_test_score, second_test_score, exam_score, '
+        'total, grade, date_recorded, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)',
+        result_rows(),
+    )
+    return students
+
+
+def build_queries(users, students):
+    from django.db.models import Count
+    from accounts.models import CustomUser
+    from results.models import Class, Result
+
+    student = students[len(students) // 2]
+    middle = users // 2
+    month_start = START + timedelta(days=400)
+    month_end = month_start + timedelta(days=30)
+    return [
+        ('teacher list, first page', lambda: CustomUser.objects.filter(role='teacher').order_by('id')[:51]),
+        ('teacher list, last page', lambda: CustomUser.objects.filter(role='teacher', id__gt=users - users // 200).order_by('id')[:51]),
+        ('student list, deep page', lambda: CustomUser.objects.filter(role='student', id__gt=middle).order_by('id')[:51]),
+        ('user by email', lambda: CustomUser.objects.filter(email=f'user{middle}@example.com')[:1]),
+        ('results for one student', lambda: Result.objects.filter(student_id=student).order_by('-id')[:51]),
+        ("one student's classes", lambda: Class.objects.filter(students=student)),
+        ('results per subject in a month', lambda: Result.objects.filter(
+            date_recorded__gte=month_start, date_recorded__lt=month_end,
+        ).values('subject').annotate(n=Count('id')).order_by()),
+    ]
+
+
+def measure(queries, repeat):
+    from django.db import connection
+
+    report = {}
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        for name, build in queries:
+            sql, params = build().query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            # Time the SQL alone so ORM overhead does not hide the plan change.
+            ms = timed(lambda: cursor.execute(sql, params).fetchall(), repeat)
+            report[name] = {'plan': plan, 'ms': round(ms, 3)}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--results', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--db', help='Scratch database path (default: a temporary file).')
+    parser.add_argument('--json', help='Also write the report to this file.')
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db or tempfile.mkstemp(suffix='.sqlite3')[1])
+    db_path.unlink(missing_ok=True)
+    setup_django(db_path)
+
+    from django.db import connection, transaction
+
+    migrate_to(BEFORE)
+    print(f'Seeding {args.users} users and {args.results} results into {db_path} ...')
+    with transaction.atomic(), connection.cursor() as cursor:
+        students = seed(cursor, args.users, args.results, random.Random(args.seed))
+
+    queries = build_queries(args.users, students)
+    before = measure(queries, args.repeat)
+    migrate_to(AFTER)
+    after = measure(queries, args.repeat)
+
+    for name, _ in queries:
+        print(f'\n{name}: {before[name]["ms"]:.3f} ms -> {after[name]["ms"]:.3f} ms')
+        print('  before: ' + ' | '.join(before[name]['plan']))
+        print('  after:  ' + ' | '.join(after[name]['plan']))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            'users': args.users, 'results': args.results, 'before': before, 'after': after,
+        }, indent=2))
+    if not args.db:
+        db_path.unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    main()
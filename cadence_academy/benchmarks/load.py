@@ -0,0 +1,297 @@
+"""
+End-to-end latency, throughput and query counts for the main API endpoints
+against a seeded school (see benchmarks.datasets).
+
+    python -m benchmarks.load --dataset medium --json before.json
+    git checkout my-branch
+    python -m benchmarks.load --dataset medium --json after.json
+    python -m benchmarks.compare before.json after.json
+
+Each scenario is first driven in-process through the test client, one
+request at a time, counting SQL queries per request. The same scenarios are
+then sent over HTTP by --concurrency client threads to a threaded WSGI
+server running in a separate process. Runs against a scratch SQLite file;
+db.sqlite3 is never touched.
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .datasets import DATASETS, PASSWORD, build_school
+from .utils import PROJECT_DIR, percentile, setup_django
+
+# make_request(rng) -> (method, path, body); role is whose token is sent.
+Scenario = namedtuple('Scenario', ['name', 'role', 'make_request'])
+
+PROFILES = ('development', 'production')
+
+
+def build_scenarios(school):
+    students, subjects, classes = school.students, school.subjects, school.classes
+
+    def login(rng):
+        return 'POST', '/api/accounts/login/', {'username': f'student{rng.randint(1, len(students))}', 'password': PASSWORD}
+
+    def results_list(rng):
+        return 'GET', '/api/results/', None
+
+    def results_create(rng):
+        row = {
+            'student': rng.choice(students), 'subject': rng.choice(subjects),
+            'first_test_score': rng.randint(0, 20), 'second_test_score': rng.randint(0, 20), 'exam_score': rng.randint(0, 60),
+        }
+        return 'POST', '/api/results/bulk/', [row]
+
+    def class_roster(rng):
+        return 'GET', f'/api/classes/{rng.choice(classes)}/?expand=students,subjects', None
+
+    def profile(rng):
+        return 'GET', f'/api/accounts/user/profile/{rng.choice(students)}/', None
+
+    return [
+        Scenario('login', None, login),
+        Scenario('results_list', 'teacher', results_list),
+        Scenario('results_create', 'teacher', results_create),
+        Scenario('class_roster', 'teacher', class_roster),
+        Scenario('profile', 'student', profile),
+    ]
+
+
+def create_tokens(school):
+    from rest_framework.authtoken.models import Token
+
+    return {
+        role: Token.objects.get_or_create(user_id=user_id)[0].key
+        for role, user_id in (('admin', school.admins[0]), ('teacher', school.teachers[0]), ('student', school.students[0]))
+    }
+
+
+def plan_requests(scenario, count, seed):
+    rng = random.Random(f'{scenario.name}:{seed}')
+    return [scenario.make_request(rng) for _ in range(count)]
+
+
+def summarise(latencies, elapsed, statuses, queries=None):
+    errors = sum(count for code, count in statuses.items() if not 200 <= int(code) < 300)
+    report = {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        **{f'p{pct}_ms': round(percentile(latencies, pct), 3) for pct in (50, 90, 95, 99)},
+        'max_ms': round(max(latencies, default=0.0), 3),
+    }
+    if queries is not None:
+        report['queries'] = {
+            'mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+            'p50': percentile(queries, 50),
+            'max': max(queries, default=0),
+        }
+    return report
+
+
+def run_in_process(scenarios, tokens, args):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+
+    def send(method, path, body, token):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        data = json.dumps(body) if body is not None else ''
+        response = client.generic(method, path, data, content_type='application/json', **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    report = {}
+    for scenario in scenarios:
+        token = tokens.get(scenario.role)
+        plan = plan_requests(scenario, args.warmup + args.requests, args.seed)
+        for method, path, body in plan[:args.warmup]:
+            send(method, path, body, token)
+
+        latencies, queries, statuses = [], [], Counter()
+        for method, path, body in plan[args.warmup:]:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                statuses[str(send(method, path, body, token))] += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        report[scenario.name] = summarise(latencies, sum(latencies) / 1000, statuses, queries)
+        print(f'  in-process {scenario.name}: p50 {report[scenario.name]["p50_ms"]:.2f} ms, '
+              f'{report[scenario.name]["queries"]["p50"]} queries')
+    return report
+
+
+def serve(db_path, profile, port_queue):
+    os.environ['CADENCE_DB_PROFILE'] = profile
+    setup_django(db_path)
+
+    from django.conf import settings
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    application = get_wsgi_application()
+    # After get_wsgi_application(), which reapplies the logging config.
+    logging.getLogger('django.server').setLevel(logging.ERROR)
+    server = ThreadedWSGIServer(('127.0.0.1', 0), WSGIRequestHandler)
+    server.set_app(application)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def run_http(db_path, scenarios, tokens, args):
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    server = context.Process(target=serve, args=(str(db_path), args.profile, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=120)
+    local = threading.local()
+
+    def send(method, path, body, token):
+        # One keep-alive connection per client thread, reopened when the
+        # server closes it (e.g. after a streamed response).
+        headers = {'Content-Type': 'application/json', 'Host': 'localhost'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):
+            connection = getattr(local, 'connection', None) or http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            local.connection = connection
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                local.connection = None
+                if attempt:
+                    return (time.perf_counter() - started) * 1000, 'failed'
+                continue
+            if response.will_close:
+                connection.close()
+                local.connection = None
+            return (time.perf_counter() - started) * 1000, str(response.status)
+
+    report = {}
+    try:
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for scenario in scenarios:
+                token = tokens.get(scenario.role)
+                plan = plan_requests(scenario, args.warmup + args.http_requests, args.seed + 1)
+                list(pool.map(lambda request: send(*request, token), plan[:args.warmup]))
+                started = time.perf_counter()
+                outcomes = list(pool.map(lambda request: send(*request, token), plan[args.warmup:]))
+                elapsed = time.perf_counter() - started
+
+                statuses = Counter(status for _, status in outcomes)
+                # Transport failures count as errors alongside non-2xx answers.
+                failed = statuses.pop('failed', 0)
+                report[scenario.name] = summarise([ms for ms, _ in outcomes], elapsed, statuses)
+                report[scenario.name]['errors'] += failed
+                print(f'  http {scenario.name}: {report[scenario.name]["throughput_rps"]:.1f} req/s, '
+                      f'p95 {report[scenario.name]["p95_ms"]:.2f} ms')
+    finally:
+        server.terminate()
+        server.join()
+    return report
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', choices=DATASETS, default='small')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--requests', type=int, default=200, help='In-process requests per scenario.')
+    parser.add_argument('--http-requests', type=int, default=400, help='HTTP requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--profile', choices=PROFILES, default='production')
+    parser.add_argument('--scenarios', nargs='+', help='Only run these scenarios.')
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--db', help='Scratch database path (default: a temporary file).')
+    parser.add_argument('--json', help='Also write the report to this file.')
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db or tempfile.mkstemp(suffix='.sqlite3')[1])
+    db_path.unlink(missing_ok=True)
+    os.environ['CADENCE_DB_PROFILE'] = args.profile
+    setup_django(db_path)
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+
+    call_command('migrate', verbosity=0)
+    print(f'Seeding the {args.dataset} school ...')
+    started = time.perf_counter()
+    school = build_school(args.dataset, args.seed)
+    seed_seconds = time.perf_counter() - started
+    tokens = create_tokens(school)
+
+    scenarios = build_scenarios(school)
+    if args.scenarios:
+        scenarios = [scenario for scenario in scenarios if scenario.name in args.scenarios]
+
+    report = {
+        'meta': {
+            'commit': _commit(),
+            'dataset': args.dataset,
+            'size': school.size._asdict(),
+            'seed': args.seed,
+            'profile': args.profile,
+            'seed_seconds': round(seed_seconds, 2),
+            'requests': args.requests,
+            'http_requests': args.http_requests,
+            'concurrency': args.concurrency,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+    }
+    try:
+        report['in_process'] = run_in_process(scenarios, tokens, args)
+        if not args.skip_http:
+            from django.db import connections
+            connections.close_all()
+            report['http'] = run_http(db_path, scenarios, tokens, args)
+    finally:
+        if not args.db:
+            for suffix in ('', '-wal', '-shm'):
+                Path(f'{db_path}{suffix}').unlink(missing_ok=True)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f'Wrote {args.json}')
+
+
+if __name__ == '__main__':
+    main()
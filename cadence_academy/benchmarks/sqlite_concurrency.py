@@ -0,0 +1,144 @@
+"""
+Read and write throughput against SQLite with N worker processes, for
+each database profile (see DB_PROFILE in settings).
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 4 --duration 10
+
+Every operation is wrapped in the same connection handling a request gets
+(close_old_connections before and after), so the development profile pays
+connection setup each time while the production profile reuses it. Each
+profile runs against its own copy of a freshly seeded scratch database;
+db.sqlite3 is never touched.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from .utils import percentile, setup_django
+
+PROFILES = ('development', 'production')
+
+
+def _wait_until(start_at):
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def worker(db_path, profile, kind, seed, start_at, duration):
+    os.environ['CADENCE_DB_PROFILE'] = profile
+    setup_django(db_path)
+
+    from django.db import OperationalError, close_old_connections, transaction
+    from results.models import Result
+
+    rng = random.Random(seed)
+    max_id = Result.objects.order_by('-id').values_list('id', flat=True).first()
+    students = list(Result.objects.values_list('student_id', flat=True).distinct()[:5000])
+    close_old_connections()
+
+    def read():
+        student = rng.choice(students)
+        list(Result.objects.filter(student_id=student).select_related('subject').order_by('-id')[:50])
+
+    def write():
+        with transaction.atomic():
+            result = Result.objects.get(pk=rng.randint(1, max_id))
+            result.exam_score = rng.randint(0, 60)
+            result.save()
+
+    operation = read if kind == 'read' else write
+    latencies, errors = [], 0
+    _wait_until(start_at)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        close_old_connections()
+        started = time.perf_counter()
+        try:
+            operation()
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append((time.perf_counter() - started) * 1000)
+        close_old_connections()
+    return kind, latencies, errors
+
+
+def run_profile(db_path, profile, args):
+    jobs = [('read', i) for i in range(args.readers)] + [('write', i) for i in range(args.writers)]
+    start_at = time.time() + 2 + 0.1 * len(jobs)
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(len(jobs)) as pool:
+        outcomes = pool.starmap(worker, [
+            (str(db_path), profile, kind, args.seed + index * 7919 + (kind == 'write'), start_at, args.duration)
+            for kind, index in jobs
+        ])
+
+    report = {}
+    for kind in ('read', 'write'):
+        latencies = [ms for k, samples, _ in outcomes if k == kind for ms in samples]
+        report[kind] = {
+            'ops': len(latencies),
+            'ops_per_sec': round(len(latencies) / args.duration, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'errors': sum(errors for k, _, errors in outcomes if k == kind),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--results', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--json', help='Also write the report to this file.')
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix='cadence-bench-'))
+    template = workdir / 'template.sqlite3'
+    setup_django(template)
+
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from .index_plan import seed
+
+    call_command('migrate', verbosity=0)
+    print(f'Seeding {args.users} users and {args.results} results ...')
+    with transaction.atomic(), connection.cursor() as cursor:
+        seed(cursor, args.users, args.results, random.Random(args.seed))
+    connection.close()
+
+    reports = {}
+    try:
+        for profile in args.profiles:
+            db_path = workdir / f'{profile}.sqlite3'
+            shutil.copy(template, db_path)
+            reports[profile] = run_profile(db_path, profile, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f'\n{args.readers} readers, {args.writers} writers, {args.duration:g}s per profile')
+    for profile, report in reports.items():
+        for kind, stats in report.items():
+            print(f'{profile:>12} {kind:>5}: {stats["ops_per_sec"]:>9.1f} ops/s  '
+                  f'p50 {stats["p50_ms"]:.2f} ms  p95 {stats["p95_ms"]:.2f} ms  errors {stats["errors"]}')
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            'readers': args.readers, 'writers': args.writers, 'duration': args.duration, 'profiles': reports,
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
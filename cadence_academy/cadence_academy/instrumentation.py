@@ -0,0 +1,310 @@
+import bisect
+import heapq
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INSTRUMENTATION = {
+    'ENABLED': True,
+    # Add Server-Timing and X-SQL-Queries headers to every response.
+    'RESPONSE_HEADERS': False,
+    # Requests slower than this, or running more queries, are logged with
+    # their slowest queries.
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_REQUEST_QUERIES': 50,
+    'SLOWEST_QUERIES': 5,
+    # Histogram buckets, in seconds and in queries per request.
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100, 200),
+    # Bearer token required by the metrics endpoint. Without one the endpoint
+    # only answers when DEBUG is on.
+    'METRICS_TOKEN': None,
+}
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The request RequestMetricsMiddleware is measuring, if any.
+_measured_request = ContextVar('measured_request', default=None)
+
+
+def _instrumentation_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULT_INSTRUMENTATION[name])
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times queries, keeping the slowest."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            entry = (elapsed, self.count, sql)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif self.keep:
+                heapq.heappushpop(self.slowest, entry)
+
+    def slowest_queries(self):
+        return [(elapsed, sql) for elapsed, _, sql in sorted(self.slowest, reverse=True)]
+
+
+def add_serialization_time(seconds):
+    request = _measured_request.get()
+    if request is not None:
+        request._serialization_seconds += seconds
+
+
+class SerializationTimingMixin:
+    """
+    Serializer mixin that counts ``to_representation`` of the response's
+    top-level serializer (or of each item of a top-level list) towards the
+    request's serialization time. Nested serializers are inside that already.
+    """
+
+    def to_representation(self, instance):
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, ListSerializer) and parent.parent is None):
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            add_serialization_time(time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus +Inf; cumulated when exported.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, buckets = 0, []
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(_instrumentation_setting('LATENCY_BUCKETS'))
+        self.queries = Histogram(_instrumentation_setting('QUERY_BUCKETS'))
+        self.sql_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.responses = {}
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _bound(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Per-view request metrics for this process. Each worker process keeps its
+    own registry, so scrape every worker (or sum them) for a full picture.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, method, status, latency, queries, sql_seconds, serialization_seconds):
+        with self._lock:
+            metrics = self._views.get((view, method))
+            if metrics is None:
+                metrics = self._views[(view, method)] = ViewMetrics()
+            metrics.latency.observe(latency)
+            metrics.queries.observe(queries)
+            metrics.sql_seconds += sql_seconds
+            metrics.serialization_seconds += serialization_seconds
+            status_class = f'{status // 100}xx'
+            metrics.responses[status_class] = metrics.responses.get(status_class, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def export(self):
+        """The metrics in Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def histogram(name, help_text, attribute):
+                lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} histogram'])
+                for (view, method), metrics in views:
+                    values = getattr(metrics, attribute)
+                    for bound, count in values.cumulative():
+                        lines.append(f'{name}_bucket{_labels(view=view, method=method, le=_bound(bound))} {count}')
+                    lines.append(f'{name}_sum{_labels(view=view, method=method)} {values.sum!r}')
+                    lines.append(f'{name}_count{_labels(view=view, method=method)} {values.count}')
+
+            def counter(name, help_text, attribute):
+                lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} counter'])
+                for (view, method), metrics in views:
+                    lines.append(f'{name}{_labels(view=view, method=method)} {getattr(metrics, attribute)!r}')
+
+            histogram('cadence_request_duration_seconds', 'Request latency by view.', 'latency')
+            histogram('cadence_request_queries', 'SQL queries per request by view.', 'queries')
+            counter('cadence_request_sql_seconds_total', 'Time spent in SQL by view.', 'sql_seconds')
+            counter(
+                'cadence_request_serialization_seconds_total', 'Time spent serializing and rendering responses by view.',
+                'serialization_seconds',
+            )
+            lines.extend([
+                '# HELP cadence_responses_total Responses by view and status class.',
+                '# TYPE cadence_responses_total counter',
+            ])
+            for (view, method), metrics in views:
+                for status_class, count in sorted(metrics.responses.items()):
+                    lines.append(f'cadence_responses_total{_labels(view=view, method=method, status=status_class)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match.route
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures each request: overall latency, SQL query count and time (on
+    every database alias) and serialization time: the response serializers'
+    to_representation (see SerializationTimingMixin) plus rendering the body.
+
+    The numbers go into the per-view histograms of ``registry``, optionally
+    into Server-Timing/X-SQL-Queries response headers, and requests over
+    the SLOW_REQUEST_* thresholds are logged with their slowest queries.
+    Keep it first in MIDDLEWARE so the latency covers the whole stack.
+
+    A streaming response (the result export) produces its body after the
+    view returns, so it is measured until the body is exhausted or closed,
+    and its serialization time is the time spent streaming. It gets no
+    headers, which are sent before the body.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _instrumentation_setting('ENABLED'):
+            return self.get_response(request)
+
+        recorder = QueryRecorder(_instrumentation_setting('SLOWEST_QUERIES'))
+        request._serialization_seconds = 0.0
+        started = time.perf_counter()
+        token = _measured_request.set(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+                if response.streaming and not response.is_async:
+                    response.streaming_content = self.measured_stream(
+                        response.streaming_content, stack.pop_all(), request, response, recorder, started,
+                    )
+                    return response
+        finally:
+            _measured_request.reset(token)
+        self.finish(request, response, recorder, started)
+        return response
+
+    def measured_stream(self, content, recording, request, response, recorder, started):
+        # Django closes this generator along with the response, so the
+        # request is recorded even if the client goes away mid-body.
+        view_returned = time.perf_counter()
+        try:
+            yield from content
+        finally:
+            recording.close()
+            request._serialization_seconds += time.perf_counter() - view_returned
+            self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        latency = time.perf_counter() - started
+        view = _view_name(request)
+        serialization = request._serialization_seconds
+        registry.record(view, request.method, response.status_code, latency, recorder.count, recorder.duration, serialization)
+
+        if _instrumentation_setting('RESPONSE_HEADERS') and not response.streaming:
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+                f'serialize;dur={serialization * 1000:.2f}',
+                f'total;dur={latency * 1000:.2f}',
+            ])
+            response['X-SQL-Queries'] = str(recorder.count)
+
+        if (latency * 1000 >= _instrumentation_setting('SLOW_REQUEST_MS')
+                or recorder.count >= _instrumentation_setting('SLOW_REQUEST_QUERIES')):
+            slowest = ''.join(
+                f'\n  {elapsed * 1000:8.2f} ms  {sql}' for elapsed, sql in recorder.slowest_queries()
+            )
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms total, %d queries in %.1f ms, %.1f ms serializing%s',
+                request.method, request.get_full_path(), view, latency * 1000,
+                recorder.count, recorder.duration * 1000, serialization * 1000, slowest,
+            )
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (serialized to JSON) after the view
+        # returns; time it with a post-render callback.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._serialization_seconds += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for ``registry``."""
+    token = _instrumentation_setting('METRICS_TOKEN')
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').encode()
+        if not hmac.compare_digest(supplied, f'Bearer {token}'.encode()):
+            return HttpResponse('Unauthorized.', status=401, content_type='text/plain')
+    elif not settings.DEBUG:
+        raise Http404('Not found.')
+    return HttpResponse(registry.export(), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,200 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+DEFAULT_MEDIA_SERVING = {
+    # Mount serve_media outside DEBUG. Leave off when the front-end server
+    # serves MEDIA_URL itself.
+    'ENABLED': False,
+    # Seconds browsers and proxies may reuse a file before revalidating it
+    # with If-None-Match / If-Modified-Since.
+    'MAX_AGE': 30 * 24 * 60 * 60,
+    # None streams the file from Django. 'X-Accel-Redirect' (nginx) or
+    # 'X-Sendfile' (Apache mod_xsendfile, lighttpd) hands the transfer, and
+    # range handling, to the front-end server.
+    'ACCEL_HEADER': None,
+    # X-Accel-Redirect only: the internal nginx location aliased to MEDIA_ROOT.
+    'ACCEL_PREFIX': '/protected-media/',
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _media_setting(name):
+    return getattr(settings, 'MEDIA_SERVING', {}).get(name, DEFAULT_MEDIA_SERVING[name])
+
+
+def media_serving_enabled():
+    return settings.DEBUG or _media_setting('ENABLED')
+
+
+def _authenticated(request):
+    # Session users are set by AuthenticationMiddleware; API clients send
+    # the same token they use for the API.
+    if request.user.is_authenticated:
+        return True
+    drf_request = Request(request)
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            if authenticator().authenticate(drf_request) is not None:
+                return True
+        except AuthenticationFailed:
+            return False
+    return False
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a ``Range: bytes=...`` header against a file of ``size`` bytes.
+
+    Returns ``(start, end)`` inclusive, ``None`` to serve the whole file
+    (no header, a malformed one, or several ranges), or raises ValueError
+    when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _range_applies(request, etag, last_modified):
+    # If-Range: only send part of the file if it is still the version the
+    # client already has the rest of; otherwise send all of it.
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class FileRange:
+    """
+    File-like view of ``length`` bytes of ``file`` from ``start``.
+
+    Keeps ``fileno()`` and leaves the file positioned at ``start``, so a
+    server's wsgi.file_wrapper can still sendfile() the slice, bounded by
+    Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _accel_response(path, full_path):
+    # The front-end server fills in the body and Content-Length.
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    header = _media_setting('ACCEL_HEADER')
+    if header.lower() == 'x-accel-redirect':
+        response[header] = _media_setting('ACCEL_PREFIX').rstrip('/') + '/' + quote(path)
+    else:
+        response[header] = full_path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT to an authenticated user.
+
+    Answers conditional requests with 304 and single byte ranges with 206.
+    With MEDIA_SERVING['ACCEL_HEADER'] set, only the headers are produced
+    here and the front-end server sends the bytes; otherwise the open file
+    is handed to the WSGI server, which can use sendfile().
+    """
+    if not _authenticated(request):
+        return HttpResponse('Authentication credentials were not provided.', status=401, content_type='text/plain')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found.')
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404('Not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found.')
+
+    etag = _etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        # private: shared caches must not hand the file to other clients.
+        patch_cache_control(response, private=True, max_age=_media_setting('MAX_AGE'))
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return finish(not_modified)
+
+    if _media_setting('ACCEL_HEADER'):
+        return finish(_accel_response(path, full_path))
+
+    size = stat.st_size
+    byte_range = None
+    if _range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return finish(response)
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    return finish(response)
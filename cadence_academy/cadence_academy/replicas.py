@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Models that are always read from the primary: a token or session created a
+# moment ago must authenticate even if the replica has not caught up yet.
+PRIMARY_MODELS = {'authtoken.token', 'sessions.session'}
+
+# Replica chosen for the current request, or None to read from the primary.
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'REPLICA_DATABASES', ()))
+
+
+def _pin_cache():
+    return caches[getattr(settings, 'REPLICA_CACHE_ALIAS', 'default')]
+
+
+def pin_cache_is_shared():
+    """
+    Whether write and sync times reach every process. The sync command and
+    each worker process have their own local-memory cache, so with one the
+    replicas are never used.
+    """
+    return not isinstance(_pin_cache(), (LocMemCache, DummyCache))
+
+
+def _synced_key(alias):
+    return f'replica-synced:{alias}'
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica picked by ReadReplicaMiddleware.
+
+    Outside a flagged request, inside a transaction on the primary, or once
+    the request has written anything, reads go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.label_lower in PRIMARY_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _read_alias.set(None)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are byte copies of the primary; they are never migrated.
+        if db in get_replicas():
+            return False
+        return None
+
+
+def _client_key(request):
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'replica-pin:' + hashlib.md5(credentials.encode()).hexdigest()
+
+
+class ReadReplicaMiddleware:
+    """
+    Routes safe requests to views with ``use_read_replica = True`` to a
+    replica.
+
+    After a client sends a write, its reads only go to replicas synced
+    since then, so it always sees its own changes. Clients are told apart
+    by their Authorization header or session cookie, and write and sync
+    times are kept in the REPLICA_CACHE_ALIAS cache, which must be shared
+    between processes for replicas to be used at all.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if get_replicas() and not pin_cache_is_shared():
+            logger.warning(
+                'REPLICA_DATABASES is set but REPLICA_CACHE_ALIAS is a process-local cache; '
+                'reading from the primary.'
+            )
+
+    def __call__(self, request):
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            key = _client_key(request)
+            if key is not None:
+                # Taken once the response is built, so after the write committed.
+                _pin_cache().set(key, time.time(), getattr(settings, 'REPLICA_PIN_MAX_SECONDS', 3600))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = get_replicas()
+        if not replicas or request.method not in SAFE_METHODS or not pin_cache_is_shared():
+            return None
+        view_class = getattr(view_func, 'cls', view_func)
+        if not getattr(view_class, 'use_read_replica', False):
+            return None
+        key = _client_key(request)
+        pin_cache = _pin_cache()
+        written_at = pin_cache.get(key) if key is not None else None
+        if written_at is not None:
+            synced = pin_cache.get_many([_synced_key(alias) for alias in replicas])
+            replicas = [alias for alias in replicas if synced.get(_synced_key(alias), 0) >= written_at]
+            if not replicas:
+                return None
+        # One replica per request so every query sees the same snapshot.
+        _read_alias.set(random.choice(replicas))
+        return None
+
+
+def sync_replica(alias):
+    """
+    Copy the primary SQLite database into replica ``alias`` with the online
+    backup API. Writers on the primary are not blocked (under WAL) and
+    readers of the replica see either the old or the new copy.
+
+    Records when the copy started, which every write committed before then
+    is part of, so ReadReplicaMiddleware knows which clients it can serve.
+    """
+    source_connection = connections[DEFAULT_DB_ALIAS]
+    source_connection.ensure_connection()
+    started_at = time.time()
+    target = sqlite3.connect(str(settings.DATABASES[alias]['NAME']), timeout=30)
+    try:
+        source_connection.connection.backup(target)
+    finally:
+        target.close()
+    _pin_cache().set(_synced_key(alias), started_at, None)
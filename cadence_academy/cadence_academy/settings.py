@@ -36,22 +36,78 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'accounts.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Upper bound for the ?page_size= query parameter on list endpoints.
+MAX_PAGE_SIZE = 500
+
+# Token -> user lookups cached by accounts.authentication.CachedTokenAuthentication.
+# Set SHARED_CACHE_ALIAS to a CACHES alias to share entries, and their
+# invalidation, between processes. Without it, entries only live for
+# LOCAL_TIMEOUT seconds, as other processes never hear of a logout.
+TOKEN_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+    'SHARED_CACHE_ALIAS': None,
+    'LOCAL_TIMEOUT': 5,
 }
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media is served to authenticated users by cadence_academy.media.serve_media,
+# mounted under DEBUG or with CADENCE_SERVE_MEDIA=1. Behind nginx, set
+# CADENCE_MEDIA_ACCEL_HEADER=X-Accel-Redirect and map ACCEL_PREFIX to
+# MEDIA_ROOT in an internal location so nginx sends the bytes itself:
+#
+#     location /protected-media/ { internal; alias /srv/cadence/media/; }
+#
+# Use X-Sendfile for Apache (mod_xsendfile) or lighttpd.
+MEDIA_SERVING = {
+    'ENABLED': DEBUG or os.environ.get('CADENCE_SERVE_MEDIA') == '1',
+    'MAX_AGE': 30 * 24 * 60 * 60,
+    'ACCEL_HEADER': os.environ.get('CADENCE_MEDIA_ACCEL_HEADER') or None,
+    'ACCEL_PREFIX': '/protected-media/',
+}
+
+# Uploads above this size are streamed to a temporary file in chunks rather
+# than held in memory; the file is then moved into MEDIA_ROOT, not copied,
+# when both are on the same filesystem.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+FILE_UPLOAD_TEMP_DIR = os.environ.get('CADENCE_UPLOAD_TEMP_DIR')
+
+# Bulk registration hashes passwords in a process pool (accounts.hashing)
+# shared by each web worker; batches below PARALLEL_THRESHOLD stay in-process.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('CADENCE_HASHING_WORKERS', 2)),
+    'PARALLEL_THRESHOLD': 64,
+}
+
+# Profile picture thumbnails, generated off-request by accounts.thumbnails.
+THUMBNAILS = {
+    'SIZES': {'small': 64, 'medium': 256, 'large': 512},
+    'FORMAT': 'JPEG',
+    'QUALITY': 82,
+    'WORKERS': 2,
+    'SYNC': False,
+}
+
 MIDDLEWARE = [
+    # First, so its latency covers the rest of the stack.
+    'cadence_academy.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cadence_academy.replicas.ReadReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,10 +139,95 @@ WSGI_APPLICATION = 'cadence_academy.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('CADENCE_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# CADENCE_DB_PROFILE=production tunes SQLite for several worker processes:
+# WAL lets readers run alongside the single writer, write transactions take
+# the lock up front (BEGIN IMMEDIATE) and wait up to busy_timeout for it
+# instead of failing with "database is locked", and connections are kept
+# open between requests.
+DB_PROFILE = os.environ.get('CADENCE_DB_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('CADENCE_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+    })
+
+
+# CADENCE_REPLICA_PATHS lists SQLite files (separated by os.pathsep) that
+# serve reads for views flagged use_read_replica; keep them current with
+# `manage.py sync_replica --interval N`. Tests read the primary instead.
+REPLICA_DATABASES = []
+for index, replica_path in enumerate(filter(None, os.environ.get('CADENCE_REPLICA_PATHS', '').split(os.pathsep)), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': replica_path, 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['cadence_academy.replicas.ReplicaRouter']
+
+# After a client sends a write, its reads only go to replicas synced since.
+# Write and sync times are kept in this cache, which has to be shared
+# between processes (see CADENCE_CACHE_DIR); with a local-memory cache,
+# replicas are not used. A write is remembered for REPLICA_PIN_MAX_SECONDS,
+# so keep the sync interval well below it.
+REPLICA_CACHE_ALIAS = 'default'
+REPLICA_PIN_MAX_SECONDS = 3600
+
+# Local-memory cache is per process. When running several worker processes,
+# set CADENCE_CACHE_DIR so cached responses and their version counters are
+# shared through the filesystem instead.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cadence-academy',
+    }
+}
+
+if os.environ.get('CADENCE_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['CADENCE_CACHE_DIR'],
+    }
+
+# Cache used by accounts.caching.VersionedResponseCacheMixin.
+RESPONSE_CACHE_ALIAS = 'default'
+
+# Academic terms (results.terms). Each entry is (name, month, day) of a
+# term's first day, in session order; a term ends the day before the next
+# one starts. Results are written to the term containing today, and closed
+# terms are moved out of the live table with `manage.py archive_term`.
+ACADEMIC_CALENDAR = {
+    'TERMS': [('First Term', 9, 1), ('Second Term', 1, 6), ('Third Term', 4, 22)],
+}
+
+# Per-request latency and SQL metrics (cadence_academy.instrumentation).
+# Per-view histograms are scraped from /metrics/ in Prometheus format, with
+# `Authorization: Bearer $CADENCE_METRICS_TOKEN` outside DEBUG.
+INSTRUMENTATION = {
+    'ENABLED': True,
+    'RESPONSE_HEADERS': DEBUG,
+    'SLOW_REQUEST_MS': int(os.environ.get('CADENCE_SLOW_REQUEST_MS', 500)),
+    'SLOW_REQUEST_QUERIES': int(os.environ.get('CADENCE_SLOW_REQUEST_QUERIES', 50)),
+    'SLOWEST_QUERIES': 5,
+    'METRICS_TOKEN': os.environ.get('CADENCE_METRICS_TOKEN'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -1,9 +1,11 @@
-from django.conf.urls.static import static
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 
+from .instrumentation import metrics_view
+from .media import media_serving_enabled, serve_media
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,7 +13,8 @@ urlpatterns = [
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
     path('api/', include('results.urls')),
     # path('api/', include('classes.urls'))
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if media_serving_enabled():
+    urlpatterns.append(path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'))
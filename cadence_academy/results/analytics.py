@@ -0,0 +1,138 @@
+import bisect
+import itertools
+import math
+
+from django.db import connections
+from django.db.models import Count
+
+from .models import GRADE_THRESHOLDS, GRADES, calculate_remark
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+MAX_HISTOGRAM_BINS = 100
+# Totals are histogrammed over 0-100; anything above lands in the last bin.
+HISTOGRAM_RANGE = (0.0, 100.0)
+
+
+def fetch_distribution(queryset):
+    """
+    Read the totals of ``queryset`` as a frequency table.
+
+    Returns ``(values, counts)``: the distinct totals in ascending order and
+    how many results have each. Totals have two decimal places in a narrow
+    range, so a whole term collapses to at most a few thousand pairs and the
+    database does the counting instead of shipping every row.
+    """
+    rows = queryset.order_by().values('total').annotate(n=Count('pk')).values_list('total', 'n').order_by('total')
+    sql, params = rows.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    if np is not None:
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), 2)
+        return table[:, 0], table[:, 1].astype(np.int64)
+    return [float(value) for value, _ in rows], [count for _, count in rows]
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def _grade_counts(count, at_least):
+    # at_least[i] = number of totals >= GRADE_THRESHOLDS[i][0]; thresholds descend.
+    counts, above = {}, 0
+    for (_, grade), reached in zip(GRADE_THRESHOLDS, at_least):
+        counts[grade] = int(reached) - above
+        above = int(reached)
+    counts['F'] = count - above
+    return counts
+
+
+def _numpy_summary(values, counts, bins):
+    count = int(counts.sum())
+    cumulative = np.cumsum(counts)
+    mean = np.dot(values, counts) / count
+    std = math.sqrt(np.dot((values - mean) ** 2, counts) / count)
+
+    # Linear interpolation between closest ranks, as numpy.percentile does on
+    # the expanded array, reading the ranks off the cumulative counts.
+    positions = (count - 1) * np.asarray([50, *PERCENTILES], dtype=np.float64) / 100
+    lower = np.floor(positions)
+    below = values[np.searchsorted(cumulative, lower, side='right')]
+    above = values[np.searchsorted(cumulative, np.minimum(lower + 1, count - 1), side='right')]
+    median, *percentiles = below + (above - below) * (positions - lower)
+
+    thresholds = [threshold for threshold, _ in GRADE_THRESHOLDS]
+    at_least = count - np.concatenate(([0], cumulative))[np.searchsorted(values, thresholds, side='left')]
+    histogram = np.histogram(np.clip(values, *HISTOGRAM_RANGE), bins=bins, range=HISTOGRAM_RANGE, weights=counts)[0]
+    stats = {'mean': mean, 'median': median, 'std': std, 'min': values[0], 'max': values[-1]}
+    return count, stats, dict(zip(PERCENTILES, percentiles)), at_least, histogram.tolist()
+
+
+def _python_summary(values, counts, bins):
+    count = sum(counts)
+    cumulative = list(itertools.accumulate(counts))
+    mean = math.fsum(value * n for value, n in zip(values, counts)) / count
+    std = math.sqrt(math.fsum((value - mean) ** 2 * n for value, n in zip(values, counts)) / count)
+
+    def percentile(pct):
+        position = (count - 1) * pct / 100
+        lower = math.floor(position)
+        below = values[bisect.bisect_right(cumulative, lower)]
+        above = values[bisect.bisect_right(cumulative, min(lower + 1, count - 1))]
+        return below + (above - below) * (position - lower)
+
+    at_least = [count - ([0] + cumulative)[bisect.bisect_left(values, threshold)] for threshold, _ in GRADE_THRESHOLDS]
+    low, high = HISTOGRAM_RANGE
+    width = (high - low) / bins
+    histogram = [0] * bins
+    for value, n in zip(values, counts):
+        histogram[min(bins - 1, max(0, int((value - low) // width)))] += n
+    stats = {'mean': mean, 'median': percentile(50), 'std': std, 'min': values[0], 'max': values[-1]}
+    return count, stats, {pct: percentile(pct) for pct in PERCENTILES}, at_least, histogram
+
+
+def describe(values, counts, bins=HISTOGRAM_BINS):
+    """Summary statistics, grade buckets and a histogram for a frequency table of totals."""
+    low, high = HISTOGRAM_RANGE
+    width = (high - low) / bins
+    edges = [low + width * index for index in range(bins + 1)]
+
+    if len(values) == 0:
+        count, percentiles, histogram = 0, dict.fromkeys(PERCENTILES), [0] * bins
+        stats = dict.fromkeys(('mean', 'median', 'std', 'min', 'max'))
+        grades = dict.fromkeys(GRADES, 0)
+    else:
+        summary = _numpy_summary if np is not None else _python_summary
+        count, stats, percentiles, at_least, histogram = summary(values, counts, bins)
+        grades = _grade_counts(count, at_least)
+
+    return {
+        'count': count,
+        **{name: _round(value) for name, value in stats.items()},
+        'percentiles': {f'p{pct}': _round(value) for pct, value in percentiles.items()},
+        'grades': {
+            grade: {
+                'count': grades[grade],
+                'share': _round(grades[grade] / count if count else 0),
+                'remark': calculate_remark(grade),
+            }
+            for grade in GRADES
+        },
+        'pass_rate': _round((count - grades['F']) / count if count else 0),
+        'histogram': [
+            {'from': _round(edges[index]), 'to': _round(edges[index + 1]), 'count': int(histogram[index])}
+            for index in range(bins)
+        ],
+    }
+
+
+def result_statistics(queryset, bins=HISTOGRAM_BINS):
+    values, counts = fetch_distribution(queryset)
+    return describe(values, counts, bins=bins)
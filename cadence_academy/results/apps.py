@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def repair_search_indexes(sender, using, **kwargs):
+    from .search_index import repair_search_indexes
+    repair_search_indexes(connections[using])
 
 
 class ResultsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'results'
+
+    def ready(self):
+        # Table rebuilds during migrate drop the search index triggers.
+        post_migrate.connect(repair_search_indexes, sender=self)
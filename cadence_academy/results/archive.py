@@ -0,0 +1,68 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import SCORE_FIELDS, ArchivedResult, Result, Term, results_changed
+
+# Rows moved per transaction, so live writers wait for one batch at most.
+ARCHIVE_BATCH_SIZE = 20000
+
+# Columns copied between Result and ArchivedResult; ids are kept.
+ARCHIVE_FIELDS = ('id', 'student', 'subject', 'term', *SCORE_FIELDS, *Result.DERIVED_FIELDS, 'date_recorded', 'updated_at')
+
+
+def _affected(model, term):
+    pairs = model.objects.filter(term=term).order_by().values_list('student_id', 'subject_id').distinct()
+    return {student for student, _ in pairs}, {subject for _, subject in pairs}
+
+
+def _move_rows(source, target, term, batch_size, progress):
+    """Move ``term``'s rows from ``source`` to ``target`` in id order. Returns the row count."""
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(source._meta.get_field(name).column) for name in ARCHIVE_FIELDS)
+    source_table, target_table = qn(source._meta.db_table), qn(target._meta.db_table)
+    term_column, id_column = qn(source._meta.get_field('term').column), qn(source._meta.pk.column)
+    in_batch = f'{term_column} = %s AND {id_column} BETWEEN %s AND %s'
+    moved, last = 0, 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {id_column} FROM {source_table} WHERE {term_column} = %s AND {id_column} > %s '
+                f'ORDER BY {id_column} LIMIT %s',
+                [term.pk, last, batch_size],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return moved
+            params = [term.pk, ids[0], ids[-1]]
+            cursor.execute(
+                f'INSERT INTO {target_table} ({columns}) SELECT {columns} FROM {source_table} WHERE {in_batch}', params,
+            )
+            cursor.execute(f'DELETE FROM {source_table} WHERE {in_batch}', params)
+        moved += len(ids)
+        last = ids[-1]
+        progress(f'{moved} results')
+
+
+def archive_term(term, batch_size=ARCHIVE_BATCH_SIZE, progress=None):
+    """
+    Move every result of ``term`` into ArchivedResult and mark the term
+    archived. Batches commit as they go, so an interrupted run is finished
+    by running it again. Returns the number of results moved.
+    """
+    students, subjects = _affected(Result, term)
+    moved = _move_rows(Result, ArchivedResult, term, batch_size, progress or (lambda message: None))
+    Term.objects.filter(pk=term.pk).update(archived_at=timezone.now())
+    term.refresh_from_db(fields=['archived_at'])
+    # Summaries only cover live results; rankings of the term now read the archive.
+    results_changed(students, subjects)
+    return moved
+
+
+def restore_term(term, batch_size=ARCHIVE_BATCH_SIZE, progress=None):
+    """Move ``term``'s archived results back into Result. Returns the number of results moved."""
+    students, subjects = _affected(ArchivedResult, term)
+    moved = _move_rows(ArchivedResult, Result, term, batch_size, progress or (lambda message: None))
+    Term.objects.filter(pk=term.pk).update(archived_at=None)
+    term.refresh_from_db(fields=['archived_at'])
+    results_changed(students, subjects)
+    return moved
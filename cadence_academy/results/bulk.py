@@ -0,0 +1,179 @@
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from .models import Subject, Result, Term, ON_CONFLICT_VENDORS, SCORE_FIELDS, calculate_grade, results_changed
+
+BulkUpsertSummary = namedtuple('BulkUpsertSummary', ['created', 'updated', 'errors'])
+
+# Matches Result's DecimalField(max_digits=5, decimal_places=2) score columns.
+SCORE_PLACES = Decimal('0.01')
+SCORE_LIMIT = Decimal('1000')
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _existing_ids(queryset, ids):
+    size = connection.features.max_query_params or len(ids) or 1
+    found = set()
+    for chunk in _chunks(ids, size):
+        found.update(queryset.filter(pk__in=chunk).values_list('pk', flat=True))
+    return found
+
+
+def _parse_id(value):
+    if isinstance(value, bool):
+        raise ValueError('A valid integer is required.')
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('A valid integer is required.')
+    if value < 1:
+        raise ValueError('Ensure this value is greater than or equal to 1.')
+    return value
+
+
+def _parse_score(value):
+    # A lighter equivalent of the serializer DecimalField: this runs for every
+    # cell of a sheet that can have hundreds of thousands of rows.
+    if isinstance(value, bool):
+        raise ValueError('A valid number is required.')
+    try:
+        value = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError('A valid number is required.')
+    if not value.is_finite():
+        raise ValueError('A valid number is required.')
+    value = value.quantize(SCORE_PLACES)
+    if abs(value) >= SCORE_LIMIT:
+        raise ValueError('Ensure that there are no more than 5 digits in total.')
+    return value
+
+
+def _clean_row(row):
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Expected an object.']}
+    cleaned, errors = {}, {}
+    for name in ('student', 'subject'):
+        try:
+            cleaned[name] = _parse_id(row.get(name))
+        except ValueError as exc:
+            errors[name] = [str(exc)]
+    for name in SCORE_FIELDS:
+        try:
+            cleaned[name] = _parse_score(row.get(name, 0))
+        except ValueError as exc:
+            errors[name] = [str(exc)]
+    return cleaned, errors
+
+
+def validate_rows(rows):
+    """
+    Validate a result sheet. Returns the cleaned rows and a list of
+    ``{'row': index, 'errors': {...}}`` entries for the rows that failed.
+    """
+    cleaned, errors = {}, []
+    for index, row in enumerate(rows):
+        row, row_errors = _clean_row(row)
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+        else:
+            cleaned[index] = row
+
+    # Existence checks are done once per distinct set of ids, not per row.
+    students = _existing_ids(CustomUser.objects.all(), {row['student'] for row in cleaned.values()})
+    subjects = _existing_ids(Subject.objects.all(), {row['subject'] for row in cleaned.values()})
+
+    seen = {}
+    for index, row in cleaned.items():
+        row_errors = {}
+        if row['student'] not in students:
+            row_errors['student'] = [f"Invalid pk \"{row['student']}\" - object does not exist."]
+        if row['subject'] not in subjects:
+            row_errors['subject'] = [f"Invalid pk \"{row['subject']}\" - object does not exist."]
+        key = (row['student'], row['subject'])
+        if key in seen:
+            row_errors['non_field_errors'] = [f'Duplicate of row {seen[key]} for this student and subject.']
+        else:
+            seen[key] = index
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+
+    errors.sort(key=lambda error: error['row'])
+    failed = {error['row'] for error in errors}
+    return [row for index, row in cleaned.items() if index not in failed], errors
+
+
+def _upsert_sql():
+    opts = Result._meta
+    qn = connection.ops.quote_name
+    columns = ['student', 'subject', 'term', *SCORE_FIELDS, *Result.DERIVED_FIELDS, 'date_recorded', 'updated_at']
+    columns = [opts.get_field(name).column for name in columns]
+    updated = [opts.get_field(name).column for name in (*SCORE_FIELDS, *Result.DERIVED_FIELDS, 'updated_at')]
+    return (
+        f"INSERT INTO {qn(opts.db_table)} ({', '.join(qn(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(qn(c) for c in columns[:3])}) "
+        f"DO UPDATE SET {', '.join(f'{qn(c)} = excluded.{qn(c)}' for c in updated)}"
+    )
+
+
+def _write_rows(rows, term, batch_size):
+    if connection.vendor not in ON_CONFLICT_VENDORS:
+        Result.objects.bulk_create(
+            [Result(student_id=row['student'], subject_id=row['subject'], term=term, **{f: row[f] for f in SCORE_FIELDS})
+             for row in rows],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['student', 'subject', 'term'],
+            update_fields=list(SCORE_FIELDS),
+        )
+        return
+
+    # Going through the ORM costs far more in SQL compilation than the
+    # database spends on the rows, so reuse one prepared upsert statement.
+    sql = _upsert_sql()
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    params = []
+    for row in rows:
+        scores = [row[f] for f in SCORE_FIELDS]
+        total = sum(scores)
+        params.append((row['student'], row['subject'], term.pk, *scores, total, calculate_grade(total), now, now))
+    with connection.cursor() as cursor:
+        for chunk in _chunks(params, batch_size):
+            cursor.executemany(sql, chunk)
+    results_changed({row['student'] for row in rows}, {row['subject'] for row in rows})
+
+
+def upsert_results(rows, batch_size=5000):
+    """
+    Insert or update a whole result sheet for the current term, keyed on
+    (student, subject).
+
+    Nothing is written unless every row is valid. Existing results keep their
+    original date_recorded; only the scores and derived columns are updated.
+    """
+    cleaned, errors = validate_rows(rows)
+    if errors:
+        return BulkUpsertSummary(0, 0, errors)
+
+    term = Term.objects.current()
+    keys = {(row['student'], row['subject']) for row in cleaned}
+    existing = set()
+    size = connection.features.max_query_params or len(keys) or 1
+    for chunk in _chunks({student for student, _ in keys}, size):
+        existing.update(
+            Result.objects.filter(term=term, student_id__in=chunk).values_list('student_id', 'subject_id')
+        )
+    updated = len(keys & existing)
+
+    with transaction.atomic():
+        _write_rows(cleaned, term, batch_size)
+    return BulkUpsertSummary(len(cleaned) - updated, updated, [])
@@ -0,0 +1,66 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import calculate_remark
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('student_id', 'student_id'),
+    ('student', 'student__username'),
+    ('subject_code', 'subject__code'),
+    ('subject', 'subject__name'),
+    ('term', 'term__name'),
+    ('first_test_score', 'first_test_score'),
+    ('second_test_score', 'second_test_score'),
+    ('exam_score', 'exam_score'),
+    ('total_score', 'total'),
+    ('grade', 'grade'),
+    ('date_recorded', 'date_recorded'),
+]
+
+HEADER = [name for name, _ in EXPORT_COLUMNS] + ['remark']
+
+# Rows fetched from the database cursor at a time; memory use is bounded by
+# this rather than by the size of the export.
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_export_values(queryset):
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    grade_index = lookups.index('grade')
+    rows = queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+    for row in rows:
+        yield row + (calculate_remark(row[grade_index]),)
+
+
+def iter_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in iter_export_values(queryset):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(queryset):
+    encoder = DjangoJSONEncoder()
+    for row in iter_export_values(queryset):
+        yield encoder.encode(dict(zip(HEADER, row))) + '\n'
+
+
+def export_rows(queryset, export_format):
+    if export_format == 'csv':
+        return iter_csv(queryset)
+    return iter_ndjson(queryset)
@@ -0,0 +1,229 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import GRADE_THRESHOLDS, GRADES, ArchivedResult, Class, Term
+
+# Totals are sums of scores capped at 1000 each (see bulk.SCORE_LIMIT).
+MAX_TOTAL = Decimal('3000')
+# Longest date_recorded window a request may ask for.
+MAX_DATE_RANGE_DAYS = 366
+
+# Parameters that only narrow an already selective filter. Neither grade nor
+# total has an index of its own; they ride on (term, subject, total) or on the
+# handful of rows a student or class already selects.
+ANCHORS = ('student', 'subject', 'class')
+
+
+def grade_total_range(grade):
+    """``(lowest, highest)`` total for ``grade``, highest exclusive; None means unbounded."""
+    bounds = [Decimal(threshold) for threshold, _ in GRADE_THRESHOLDS]
+    if grade == 'F':
+        return None, bounds[-1]
+    index = [name for _, name in GRADE_THRESHOLDS].index(grade)
+    return bounds[index], bounds[index - 1] if index else None
+
+
+def _parse_id(value):
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError('A valid integer is required.')
+    if value < 1:
+        raise ValueError('Ensure this value is greater than or equal to 1.')
+    return value
+
+
+def _parse_total(value):
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise ValueError('A valid number is required.')
+    if not value.is_finite() or not 0 <= value <= MAX_TOTAL:
+        raise ValueError(f'Ensure this value is between 0 and {MAX_TOTAL}.')
+    return value
+
+
+def _parse_day(value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError('Date has wrong format. Use YYYY-MM-DD.')
+    return day
+
+
+def _parse_term(value):
+    if value.lower() in ('current', 'all'):
+        return value.lower()
+    try:
+        return _parse_id(value)
+    except ValueError:
+        raise ValueError('Use a term id, "current" or "all".')
+
+
+def _parse_grade(value):
+    grade = value.upper()
+    if grade not in GRADES:
+        raise ValueError(f"Select one of {', '.join(GRADES)}.")
+    return grade
+
+
+PARSERS = {
+    'student': _parse_id,
+    'subject': _parse_id,
+    'class': _parse_id,
+    'grade': _parse_grade,
+    'total_min': _parse_total,
+    'total_max': _parse_total,
+    'date_from': _parse_day,
+    'date_to': _parse_day,
+    'term': _parse_term,
+}
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def archived_requested(params):
+    """Whether ?archived= opts into the archive table. Raises ValueError unless it is a boolean."""
+    value = (params.get('archived') or '').strip().lower()
+    if value in ('', '0', 'false'):
+        return False
+    if value in ('1', 'true'):
+        return True
+    raise ValueError('Must be true or false.')
+
+
+def parse_result_filters(params, default_term='current'):
+    """
+    Validate the result filter query parameters. Returns ``(values, errors)``
+    with the parsed value of every parameter given, and ``term`` defaulting
+    to ``default_term``. A date range given with one end only is closed
+    MAX_DATE_RANGE_DAYS from it.
+    """
+    values, errors = {'term': default_term}, {}
+    for name, parse in PARSERS.items():
+        raw = params.get(name)
+        if raw in (None, ''):
+            continue
+        try:
+            values[name] = parse(raw.strip())
+        except ValueError as exc:
+            errors[name] = [str(exc)]
+    if errors:
+        return values, errors
+
+    if ('grade' in values or 'total_min' in values or 'total_max' in values) and not any(
+        name in values for name in ANCHORS
+    ):
+        errors['non_field_errors'] = ['Filter by student, subject or class to filter by grade or total.']
+    if values.get('total_min') is not None and values.get('total_max') is not None:
+        if values['total_min'] > values['total_max']:
+            errors['total_max'] = ['Must not be lower than total_min.']
+    longest = timedelta(days=MAX_DATE_RANGE_DAYS - 1)
+    if 'date_from' in values and 'date_to' not in values:
+        values['date_to'] = values['date_from'] + longest
+    elif 'date_to' in values and 'date_from' not in values:
+        values['date_from'] = values['date_to'] - longest
+    if 'date_from' in values:
+        span = (values['date_to'] - values['date_from']).days
+        if span < 0:
+            errors['date_to'] = ['Must not be earlier than date_from.']
+        elif span >= MAX_DATE_RANGE_DAYS:
+            errors['date_to'] = [f'Date ranges are limited to {MAX_DATE_RANGE_DAYS} days.']
+    return values, errors
+
+
+def result_filter_q(values):
+    """
+    Build the WHERE clause for parsed filters. Every predicate is a plain
+    comparison on an indexed column, so it can drive an index:
+
+    - student, subject: the (student, subject, term) unique index and subject's FK index;
+    - class: student_id IN (the class roster) and, unless a subject is given,
+      subject_id IN (the class's subjects), probing (student, subject, term);
+    - grade and total: a total range, which is (term, subject, total) with a subject;
+    - dates: a half-open date_recorded range, never date(date_recorded);
+    - term: term_id, with "current" resolved by a subquery in the same statement.
+    """
+    q = Q()
+    term = values.get('term', 'all')
+    if term == 'current':
+        q &= Q(term_id=Term.objects.current_id())
+    elif term != 'all':
+        q &= Q(term_id=term)
+    if 'student' in values:
+        q &= Q(student_id=values['student'])
+    if 'subject' in values:
+        q &= Q(subject_id=values['subject'])
+    if 'class' in values:
+        q &= Q(student_id__in=Class.students.through.objects.filter(class_id=values['class']).values('customuser_id'))
+        if 'subject' not in values:
+            subject_ids = list(
+                Class.subjects.through.objects.filter(class_id=values['class']).values_list('subject_id', flat=True)
+            )
+            # A class without listed subjects takes them all, as in rankings.
+            if subject_ids:
+                q &= Q(subject_id__in=subject_ids)
+
+    lowest, highest = values.get('total_min'), values.get('total_max')
+    if 'grade' in values:
+        grade_low, grade_high = grade_total_range(values['grade'])
+        if grade_low is not None:
+            q &= Q(total__gte=grade_low)
+        if grade_high is not None:
+            q &= Q(total__lt=grade_high)
+    if lowest is not None:
+        q &= Q(total__gte=lowest)
+    if highest is not None:
+        q &= Q(total__lte=highest)
+
+    if 'date_from' in values:
+        q &= Q(date_recorded__gte=_start_of_day(values['date_from']))
+    if 'date_to' in values:
+        q &= Q(date_recorded__lt=_start_of_day(values['date_to'] + timedelta(days=1)))
+    return q
+
+
+def filter_results(queryset, params, default_term=None):
+    """
+    Apply the result filters in ``params`` to ``queryset``. Returns
+    ``(queryset, errors)``. Unless ``default_term`` says otherwise, live
+    results default to the current term and archived ones to every
+    archived term.
+    """
+    if default_term is None:
+        default_term = 'all' if queryset.model is ArchivedResult else 'current'
+    values, errors = parse_result_filters(params, default_term)
+    if errors:
+        return queryset, errors
+    return queryset.filter(result_filter_q(values)), errors
+
+
+class ResultFilterBackend(BaseFilterBackend):
+    """
+    ?student=&subject=&class=&grade=&total_min=&total_max=&date_from=&date_to=&term=
+
+    Grade and total filters need a student, subject or class alongside
+    them, and date ranges are capped at MAX_DATE_RANGE_DAYS, so no
+    combination falls back to scanning the whole table.
+
+    A detail lookup finds its result in any term unless ?term= is given:
+    results of earlier terms can still be read, corrected or deleted by id.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        lookup = getattr(view, 'lookup_url_kwarg', None) or getattr(view, 'lookup_field', 'pk')
+        default_term = 'all' if lookup in getattr(view, 'kwargs', {}) else None
+        queryset, errors = filter_results(queryset, request.query_params, default_term)
+        if errors:
+            raise ValidationError(errors)
+        return queryset
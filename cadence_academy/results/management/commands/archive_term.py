@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from results.archive import ARCHIVE_BATCH_SIZE, archive_term, restore_term
+from results.models import Term
+
+
+class Command(BaseCommand):
+    help = 'Move the results of closed terms out of the live results table into the archive, or back with --restore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', help='Term ids or names.')
+        parser.add_argument('--all-closed', action='store_true', help='Archive every closed term not archived yet.')
+        parser.add_argument('--restore', action='store_true', help='Move archived results back into the live table.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--vacuum', action='store_true', help='VACUUM the database afterwards to return the freed space.')
+
+    def get_terms(self, options):
+        terms = []
+        for value in options['terms']:
+            lookup = {'pk': int(value)} if value.isdigit() else {'name': value}
+            try:
+                terms.append(Term.objects.get(**lookup))
+            except Term.DoesNotExist:
+                raise CommandError(f'Term "{value}" does not exist.')
+        if options['all_closed']:
+            if options['restore']:
+                raise CommandError('--all-closed cannot be combined with --restore.')
+            terms += [term for term in Term.objects.filter(archived_at=None) if term.is_closed and term not in terms]
+        if not terms and not options['all_closed']:
+            raise CommandError('Name the terms to move, or pass --all-closed.')
+        return terms
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        terms = self.get_terms(options)
+        for term in terms:
+            if not options['restore'] and not term.is_closed:
+                raise CommandError(f'{term} has not closed yet (it ends on {term.ends_on}).')
+
+        move = restore_term if options['restore'] else archive_term
+        for term in terms:
+            started = time.perf_counter()
+            moved = move(
+                term, batch_size=options['batch_size'],
+                progress=lambda message: self.stdout.write(f'  {term}: {message} ({time.perf_counter() - started:.1f}s)'),
+            )
+            verb = 'Restored' if options['restore'] else 'Archived'
+            self.stdout.write(self.style.SUCCESS(f'{verb} {moved} results of {term} in {time.perf_counter() - started:.1f}s.'))
+
+        if options['vacuum'] and terms and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+            self.stdout.write('Vacuumed the database.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from results.models import StudentSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-student, per-term transcript summaries from the results table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='students', help='Only rebuild this student (repeatable).')
+
+    def handle(self, *args, **options):
+        StudentSummary.objects.rebuild(options['students'])
+        scope = f"{len(options['students'])} student(s)" if options['students'] else 'all students'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt transcript summaries for {scope}; {StudentSummary.objects.count()} student terms in total.'))
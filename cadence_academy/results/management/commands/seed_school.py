@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from results.models import Subject
+from results.seeding import BATCH_SIZE, DEFAULT_PASSWORD, MAX_PREFIX_LENGTH, SCHOOL_SIZES, seed_school
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic school (users, profiles, classes, subjects, rosters and results) for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SCHOOL_SIZES, default='small', help='Preset; the options below override it.')
+        for name in SCHOOL_SIZES['small']._fields:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password shared by every generated user.')
+        parser.add_argument('--prefix', default='', help='Prepended to usernames, emails, subject codes and class names, to seed more than one school.')
+        parser.add_argument('--days', type=int, default=120, help='Spread current-term date_recorded over this many past days.')
+        parser.add_argument('--terms', type=int, default=1, help='Seed results for the current term and this many minus one before it.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        size = SCHOOL_SIZES[options['size']]._replace(
+            **{name: options[name] for name in SCHOOL_SIZES['small']._fields if options[name] is not None}
+        )
+        for name, value in size._asdict().items():
+            if value < (0 if name in ('teachers', 'admins') else 1):
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options['days'] < 1 or options['terms'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days, --terms and --batch-size must be positive.')
+        if size.subjects > 999 or len(options['prefix']) > MAX_PREFIX_LENGTH:
+            raise CommandError(f'Subject codes allow at most 999 subjects and a {MAX_PREFIX_LENGTH}-character prefix.')
+
+        prefix = options['prefix']
+        if (CustomUser.objects.filter(username__in=[f'{prefix}admin1', f'{prefix}teacher1', f'{prefix}student1']).exists()
+                or Subject.objects.filter(code=f'{prefix}S001').exists()):
+            raise CommandError(f'A school with prefix "{prefix}" has already been seeded; pass a different --prefix.')
+
+        started = time.perf_counter()
+        school = seed_school(
+            size, seed=options['seed'], password=options['password'], prefix=prefix,
+            days=options['days'], terms=options['terms'], batch_size=options['batch_size'],
+            progress=lambda message: self.stdout.write(f'  {message} ({time.perf_counter() - started:.1f}s)'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(school.students)} students, {len(school.teachers)} teachers, {len(school.admins)} admins, '
+            f'{len(school.classes)} classes and {school.results} results over {len(school.terms)} term(s) in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+
+def backfill_total_and_grade(apps, schema_editor):
+    Result = apps.get_model('results', 'Result')
+    results = Result.objects.using(schema_editor.connection.alias)
+    results.update(total=F('first_test_score') + F('second_test_score') + F('exam_score'))
+    results.update(grade=Case(
+        When(total__gte=90, then=Value('A')),
+        When(total__gte=80, then=Value('B')),
+        When(total__gte=70, then=Value('C')),
+        When(total__gte=60, then=Value('D')),
+        default=Value('F'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='grade',
+            field=models.CharField(default='F', editable=False, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=6),
+        ),
+        migrations.RunPython(backfill_total_and_grade, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['subject', 'total'], name='result_subject_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['student', 'grade'], name='result_student_grade_idx'),
+        ),
+    ]
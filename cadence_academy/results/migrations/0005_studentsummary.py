@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    Result = apps.get_model('results', 'Result')
+    StudentSummary = apps.get_model('results', 'StudentSummary')
+    alias = schema_editor.connection.alias
+    rows = Result.objects.using(alias).order_by().values('student_id').annotate(
+        result_count=Count('pk'),
+        total_sum=Sum('total'),
+        **{f'grade_{grade.lower()}': Count('pk', filter=Q(grade=grade)) for grade in 'ABCDF'},
+    )
+    StudentSummary.objects.using(alias).bulk_create([StudentSummary(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_indexes'),
+        ('results', '0004_result_date_recorded_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('result_count', models.PositiveIntegerField(default=0)),
+                ('total_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('grade_a', models.PositiveIntegerField(default=0)),
+                ('grade_b', models.PositiveIntegerField(default=0)),
+                ('grade_c', models.PositiveIntegerField(default=0)),
+                ('grade_d', models.PositiveIntegerField(default=0)),
+                ('grade_f', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
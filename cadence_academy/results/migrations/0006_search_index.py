@@ -0,0 +1,72 @@
+from django.db import OperationalError, migrations
+
+# The index definitions as they were when this migration was written,
+# frozen here; results.search_index keeps the live copy that repairs them.
+# FTS5 indexes over existing tables (external content), kept in step by
+# triggers so raw inserts and bulk writes are indexed too. The prefix
+# indexes let "oka*" style lookups read one doclist instead of merging
+# every term that starts with "oka". role is indexed so searches can be
+# narrowed to a role inside the index.
+SEARCH_INDEXES = [
+    ('search_users', 'accounts_customuser', ['username', 'email', 'first_name', 'last_name', 'bio', 'role']),
+    ('search_classes', 'results_class', ['name']),
+    ('search_subjects', 'results_subject', ['name', 'code']),
+]
+
+
+def _create_statements(fts_table, source_table, columns):
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    changed = ' OR '.join(f'old.{column} IS NOT new.{column}' for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f'INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_list}, content='{source_table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6')",
+        f'CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {source_table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {source_table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER {fts_table}_update AFTER UPDATE OF {column_list} ON {source_table} '
+        f'WHEN {changed} BEGIN {delete_old} {insert_new} END',
+        f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Other databases search with icontains instead (see results.search).
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(probe)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+        except OperationalError:
+            # SQLite built without FTS5.
+            return
+        for fts_table, source_table, columns in SEARCH_INDEXES:
+            for statement in _create_statements(fts_table, source_table, columns):
+                cursor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for fts_table, _, _ in SEARCH_INDEXES:
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_customuser_profile_picture_thumbnails'),
+        ('results', '0005_studentsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:04
+
+from datetime import date, datetime, time, timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.utils import timezone
+
+# The calendar and term_bounds() as they were when this migration was
+# written (see results.terms), frozen so that later calendar changes do not
+# alter how a fresh database is migrated.
+TERMS = [('First Term', 9, 1), ('Second Term', 1, 6), ('Third Term', 4, 22)]
+
+
+def term_bounds(day):
+    session_start = tuple(TERMS[0][1:])
+    first_year = day.year if (day.month, day.day) >= session_start else day.year - 1
+    starts = [
+        (name, date(first_year if (month, start_day) >= session_start else first_year + 1, month, start_day))
+        for name, month, start_day in TERMS
+    ]
+    starts.append((None, date(first_year + 1, *session_start)))
+    for (name, starts_on), (_, next_starts_on) in zip(starts, starts[1:]):
+        if starts_on <= day < next_starts_on:
+            return f'{first_year}/{first_year + 1} {name}', starts_on, next_starts_on - timedelta(days=1)
+    raise ValueError(f'Terms do not cover {day}.')
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def assign_terms(apps, schema_editor):
+    # Existing results belong to the calendar term they were recorded in.
+    Result = apps.get_model('results', 'Result')
+    Term = apps.get_model('results', 'Term')
+    alias = schema_editor.connection.alias
+    results = Result.objects.using(alias)
+    span = results.aggregate(first=Min('date_recorded'), last=Max('date_recorded'))
+    if span['first'] is None:
+        return
+    day, last = timezone.localdate(span['first']), timezone.localdate(span['last'])
+    while day <= last:
+        name, starts_on, ends_on = term_bounds(day)
+        in_term = results.filter(
+            date_recorded__gte=_start_of_day(starts_on),
+            date_recorded__lt=_start_of_day(ends_on + timedelta(days=1)),
+        )
+        if in_term.exists():
+            term, _ = Term.objects.using(alias).get_or_create(
+                starts_on=starts_on, defaults={'name': name, 'ends_on': ends_on},
+            )
+            in_term.update(term=term)
+        day = ends_on + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0006_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Term',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('starts_on', models.DateField(unique=True)),
+                ('ends_on', models.DateField()),
+                ('archived_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['starts_on'],
+            },
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='term',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='results.term'),
+        ),
+        migrations.RunPython(assign_terms, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='result',
+            name='term',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='results.term'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='result',
+            unique_together={('student', 'subject', 'term')},
+        ),
+        migrations.RemoveIndex(
+            model_name='result',
+            name='result_subject_total_idx',
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['term', 'subject', 'total'], name='result_term_subject_total_idx'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_test_score', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('second_test_score', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('exam_score', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('total', models.DecimalField(decimal_places=2, editable=False, max_digits=6)),
+                ('grade', models.CharField(editable=False, max_length=1)),
+                ('date_recorded', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('subject', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='results.subject')),
+                ('term', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='results.term')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'subject', 'total'], name='archived_term_subject_idx')],
+            },
+        ),
+    ]
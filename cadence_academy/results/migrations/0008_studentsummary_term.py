@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    Result = apps.get_model('results', 'Result')
+    StudentSummary = apps.get_model('results', 'StudentSummary')
+    alias = schema_editor.connection.alias
+    rows = Result.objects.using(alias).order_by().values('student_id', 'term_id').annotate(
+        result_count=Count('pk'),
+        total_sum=Sum('total'),
+        **{f'grade_{grade.lower()}': Count('pk', filter=Q(grade=grade)) for grade in 'ABCDF'},
+    )
+    StudentSummary.objects.using(alias).bulk_create([StudentSummary(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('results', '0007_term_archivedresult'),
+    ]
+
+    operations = [
+        # One row per student and term instead of per student; the rows are
+        # derived data, so they are rebuilt rather than converted.
+        migrations.DeleteModel(
+            name='StudentSummary',
+        ),
+        migrations.CreateModel(
+            name='StudentSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result_count', models.PositiveIntegerField(default=0)),
+                ('total_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('grade_a', models.PositiveIntegerField(default=0)),
+                ('grade_b', models.PositiveIntegerField(default=0)),
+                ('grade_c', models.PositiveIntegerField(default=0)),
+                ('grade_d', models.PositiveIntegerField(default=0)),
+                ('grade_f', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to=settings.AUTH_USER_MODEL)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='results.term')),
+            ],
+            options={
+                'unique_together': {('student', 'term')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,39 @@
-from django.db import models
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
 from django.conf import settings
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from accounts.models import CustomUser  
+from accounts.caching import bump_version_on_commit
+from .terms import term_bounds
+
+# Lower bound of each grade, highest first. Anything below the last bound is an F.
+GRADE_THRESHOLDS = [
+    (90, 'A'),
+    (80, 'B'),
+    (70, 'C'),
+    (60, 'D'),
+]
+
+SCORE_FIELDS = ('first_test_score', 'second_test_score', 'exam_score')
+
+GRADES = [grade for _, grade in GRADE_THRESHOLDS] + ['F']
+
+# Vendors that understand INSERT ... ON CONFLICT (...) DO UPDATE.
+ON_CONFLICT_VENDORS = ('sqlite', 'postgresql')
 
 def calculate_grade(total):
-    if total >= 90:
-        return 'A'
-    elif total >= 80:
-        return 'B'
-    elif total >= 70:
-        return 'C'
-    elif total >= 60:
-        return 'D'
-    else:
-        return 'F'
+    for threshold, grade in GRADE_THRESHOLDS:
+        if total >= threshold:
+            return grade
+    return 'F'
 
 def calculate_remark(grade):
     return {
@@ -26,6 +47,53 @@ def calculate_remark(grade):
 class Subject(models.Model):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=10, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+class TermManager(models.Manager):
+    def containing(self, day):
+        """The terms that already have a row and contain ``day``, latest first."""
+        return self.filter(starts_on__lte=day, ends_on__gte=day).order_by('-starts_on')
+
+    def for_date(self, day):
+        """The term containing ``day``, created from ACADEMIC_CALENDAR if there is none yet."""
+        term = self.containing(day).first()
+        if term is None:
+            bounds = term_bounds(day)
+            term, _ = self.get_or_create(
+                starts_on=bounds.starts_on, defaults={'name': bounds.name, 'ends_on': bounds.ends_on},
+            )
+        return term
+
+    def current(self):
+        return self.for_date(timezone.localdate())
+
+    def current_id(self):
+        # The current term's id as a subquery, so filtering on it costs no
+        # extra round trip. None (matching nothing) until the term has a row.
+        return Subquery(self.containing(timezone.localdate()).values('pk')[:1])
+
+class Term(models.Model):
+    """
+    An academic term. Results are written to the current term, which is
+    created from ACADEMIC_CALENDAR on first use. Once a term has closed,
+    ``manage.py archive_term`` moves its results into ArchivedResult.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    starts_on = models.DateField(unique=True)
+    ends_on = models.DateField()
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TermManager()
+
+    class Meta:
+        ordering = ['starts_on']
+
+    @property
+    def is_closed(self):
+        return self.ends_on < timezone.localdate()
 
     def __str__(self):
         return self.name
@@ -39,25 +107,375 @@ class Class(models.Model):
     def __str__(self):
         return f"{self.name} ({self.teacher.username if self.teacher else 'No teacher assigned'})"
 
+def total_expression(**scores):
+    # Sum of the three scores as a SQL expression. Scores passed in replace the
+    # corresponding column, so the expression reflects values about to be written.
+    first, second, exam = (scores.get(field, F(field)) for field in SCORE_FIELDS)
+    return first + second + exam
+
+def grade_expression(total):
+    return Case(
+        *[When(GreaterThanOrEqual(total, threshold), then=Value(grade)) for threshold, grade in GRADE_THRESHOLDS],
+        default=Value('F'),
+        output_field=models.CharField(),
+    )
+
+# Result fields that feed StudentSummary and the subject rankings.
+TRACKED_FIELDS = {*SCORE_FIELDS, 'student', 'student_id', 'subject', 'subject_id', 'term', 'term_id'}
+
+_tracking_deferred = ContextVar('tracking_deferred', default=False)
+
+
+@contextmanager
+def tracking_deferred():
+    """Skip the per-row signal work; the caller reports the change with results_changed()."""
+    token = _tracking_deferred.set(True)
+    try:
+        yield
+    finally:
+        _tracking_deferred.reset(token)
+
+def ranking_label(subject_id):
+    # Version label for cached rankings that include this subject's results.
+    return f'results.Result:subject:{subject_id}'
+
+def results_changed(students, subjects):
+    """Bring summaries and ranking caches in line after a bulk write."""
+    StudentSummary.objects.rebuild(students)
+    for subject_id in set(subjects):
+        bump_version_on_commit(ranking_label(subject_id))
+
+class ResultQuerySet(models.QuerySet):
+    # total and grade are stored columns derived from the scores, so every
+    # write path that can touch the scores has to keep them in step. Writes
+    # also stamp updated_at, which bulk paths would otherwise skip.
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        untermed = [obj for obj in objs if obj.term_id is None]
+        if untermed:
+            term = Term.objects.current()
+            for obj in untermed:
+                obj.term = term
+        for obj in objs:
+            obj.update_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            extra = Result.DERIVED_FIELDS if set(update_fields) & set(SCORE_FIELDS) else ()
+            kwargs['update_fields'] = list(update_fields) + [
+                f for f in (*extra, 'updated_at') if f not in update_fields
+            ]
+        created = super().bulk_create(objs, *args, **kwargs)
+        results_changed({obj.student_id for obj in objs}, {obj.subject_id for obj in objs})
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        if set(fields) & set(SCORE_FIELDS):
+            for obj in objs:
+                obj.update_derived_fields()
+            fields += [f for f in Result.DERIVED_FIELDS if f not in fields]
+        if 'updated_at' not in fields:
+            fields.append('updated_at')
+        if not set(fields) & TRACKED_FIELDS:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+        students, subjects = {obj.student_id for obj in objs}, {obj.subject_id for obj in objs}
+        if {'student', 'subject'} & set(fields):
+            old_students, old_subjects = self.filter(pk__in=[obj.pk for obj in objs])._affected()
+            students |= old_students
+            subjects |= old_subjects
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        results_changed(students, subjects)
+        return rows
+
+    def update(self, **kwargs):
+        if set(kwargs) & set(SCORE_FIELDS):
+            total = total_expression(**kwargs)
+            kwargs['total'] = total
+            kwargs['grade'] = grade_expression(total)
+        kwargs.setdefault('updated_at', timezone.now())
+        if not set(kwargs) & TRACKED_FIELDS:
+            return super().update(**kwargs)
+
+        students, subjects = self._affected()
+        for name, affected in (('student', students), ('subject', subjects)):
+            value = kwargs.get(name, kwargs.get(f'{name}_id'))
+            if value is not None:
+                affected.add(getattr(value, 'pk', value))
+        rows = super().update(**kwargs)
+        results_changed(students, subjects)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        # Rebuild each affected summary once rather than applying a
+        # post_delete delta per row.
+        students, subjects = self._affected()
+        with tracking_deferred():
+            deleted = super().delete()
+        results_changed(students, subjects)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def _affected(self):
+        pairs = self.order_by().values_list('student_id', 'subject_id').distinct()
+        return {student for student, _ in pairs}, {subject for _, subject in pairs}
+
 class Result(models.Model):
+    DERIVED_FIELDS = ('total', 'grade')
+
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    term = models.ForeignKey(Term, on_delete=models.PROTECT)
     first_test_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     second_test_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     exam_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=6, decimal_places=2, default=0, editable=False)
+    grade = models.CharField(max_length=1, default='F', editable=False)
     date_recorded = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ResultQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked_values = instance.tracked_values()
+        return instance
+
+    def tracked_values(self):
+        # What this result contributes to its student's summary and its
+        # subject's ranking, or None if those fields were not loaded.
+        if {'student_id', 'subject_id', 'total', 'grade', 'term_id'} & self.get_deferred_fields():
+            return None
+        return self.student_id, self.subject_id, self.total, self.grade, self.term_id
 
     def total_score(self):
         return self.first_test_score + self.second_test_score + self.exam_score
 
-    def grade(self):
-        return calculate_grade(self.total_score())
+    def update_derived_fields(self):
+        self.total = self.total_score()
+        self.grade = calculate_grade(self.total)
+
+    def remark(self):
+        return calculate_remark(self.grade)
+
+    def save(self, *args, **kwargs):
+        if self.term_id is None:
+            self.term = Term.objects.current()
+        self.update_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if update_fields & set(SCORE_FIELDS):
+                update_fields |= set(self.DERIVED_FIELDS)
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.student.username} - {self.subject.name}: Total {self.total}, Grade {self.grade}"
+
+    class Meta:
+        unique_together = ('student', 'subject', 'term')
+        indexes = [
+            # Rankings and statistics of a subject within a term.
+            models.Index(fields=['term', 'subject', 'total'], name='result_term_subject_total_idx'),
+            models.Index(fields=['student', 'grade'], name='result_student_grade_idx'),
+            # Date-range queries (term reports, exports).
+            models.Index(fields=['date_recorded'], name='result_date_recorded_idx'),
+        ]
+
+
+class ArchivedResult(models.Model):
+    """
+    A result of an archived term, moved out of Result by ``manage.py
+    archive_term`` so the live table and its indexes only hold open terms.
+    Rows keep their Result id. Archived results are read-only; restore the
+    term (``archive_term --restore``) to change them.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Archived terms are read a term at a time, so one composite index
+    # stands in for separate subject and term indexes.
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, db_index=False)
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, db_index=False)
+    first_test_score = models.DecimalField(max_digits=5, decimal_places=2)
+    second_test_score = models.DecimalField(max_digits=5, decimal_places=2)
+    exam_score = models.DecimalField(max_digits=5, decimal_places=2)
+    total = models.DecimalField(max_digits=6, decimal_places=2, editable=False)
+    grade = models.CharField(max_length=1, editable=False)
+    date_recorded = models.DateTimeField()
+    updated_at = models.DateTimeField()
 
     def remark(self):
-        return calculate_remark(self.grade())
+        return calculate_remark(self.grade)
+
+    def __str__(self):
+        return f"{self.student.username} - {self.subject.name}: Total {self.total}, Grade {self.grade} (archived)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'subject', 'total'], name='archived_term_subject_idx'),
+        ]
+
+
+class StudentSummaryManager(models.Manager):
+    def rebuild(self, student_ids=None):
+        """
+        Recompute summaries from the results table, for ``student_ids`` or,
+        when None, for every student. A student left without results in a
+        term loses that term's summary row.
+        """
+        with transaction.atomic():
+            if student_ids is None:
+                self.all().delete()
+                student_ids = Result.objects.order_by().values_list('student_id', flat=True).distinct()
+            student_ids = sorted(student_ids)
+            size = connection.features.max_query_params or len(student_ids) or 1
+            for start in range(0, len(student_ids), size):
+                chunk = student_ids[start:start + size]
+                results = Result.objects.filter(student_id__in=chunk)
+                in_term = Result.objects.filter(student_id=OuterRef('student_id'), term_id=OuterRef('term_id'))
+                self.filter(student_id__in=chunk).exclude(Exists(in_term)).delete()
+                self._write(results)
+
+    def _write(self, results):
+        aggregates = {
+            'result_count': Count('pk'),
+            'total_sum': Sum('total'),
+            **{StudentSummary.grade_field(grade): Count('pk', filter=Q(grade=grade)) for grade in GRADES},
+        }
+        rows = results.order_by().values('student_id', 'term_id').annotate(**aggregates)
+        if connection.vendor not in ON_CONFLICT_VENDORS:
+            self.bulk_create(
+                [StudentSummary(**row) for row in rows],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['student', 'term'],
+                update_fields=[*aggregates, 'updated_at'],
+            )
+            return
+
+        # Aggregate and upsert in one statement; the rows never leave the database.
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        columns = [opts.get_field(name).column for name in ('student', 'term', *aggregates, 'updated_at')]
+        rows = rows.annotate(updated_at=Value(timezone.now(), output_field=models.DateTimeField()))
+        select, params = rows.query.sql_with_params()
+        sql = (
+            f"INSERT INTO {qn(opts.db_table)} ({', '.join(qn(c) for c in columns)}) {select} "
+            f"ON CONFLICT ({qn(columns[0])}, {qn(columns[1])}) "
+            f"DO UPDATE SET {', '.join(f'{qn(c)} = excluded.{qn(c)}' for c in columns[2:])}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def apply(self, student_id, term_id, count, total, grades):
+        """Add a change to one student's summary for a term. Returns False if there is no row yet."""
+        changes = {
+            'result_count': F('result_count') + count,
+            'total_sum': F('total_sum') + total,
+            'updated_at': timezone.now(),
+        }
+        for grade, delta in grades.items():
+            if delta:
+                field = StudentSummary.grade_field(grade)
+                changes[field] = F(field) + delta
+        return bool(self.filter(student_id=student_id, term_id=term_id).update(**changes))
+
+class StudentSummary(models.Model):
+    """
+    Running totals over a student's results in one unarchived term, kept
+    in step by the Result signals and the bulk paths. ``manage.py
+    rebuild_transcripts`` recomputes them from scratch.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='summaries')
+    term = models.ForeignKey(Term, on_delete=models.CASCADE, related_name='summaries')
+    result_count = models.PositiveIntegerField(default=0)
+    total_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    grade_a = models.PositiveIntegerField(default=0)
+    grade_b = models.PositiveIntegerField(default=0)
+    grade_c = models.PositiveIntegerField(default=0)
+    grade_d = models.PositiveIntegerField(default=0)
+    grade_f = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StudentSummaryManager()
+
+    @staticmethod
+    def grade_field(grade):
+        return f'grade_{grade.lower()}'
+
+    @property
+    def average(self):
+        if not self.result_count:
+            return None
+        return (self.total_sum / self.result_count).quantize(Decimal('0.01'))
+
+    @property
+    def grade_counts(self):
+        return {grade: getattr(self, self.grade_field(grade)) for grade in GRADES}
+
+    @property
+    def subjects_passed(self):
+        return self.result_count - self.grade_f
 
     def __str__(self):
-        return f"{self.student.username} - {self.subject.name}: Total {self.total_score()}, Grade {self.grade()}"
+        return f"{self.student_id} in term {self.term_id}: {self.result_count} results, average {self.average}"
 
     class Meta:
-        unique_together = ('student', 'subject')
+        unique_together = ('student', 'term')
+
+
+@receiver(post_save, sender=Result)
+def result_saved(sender, instance, created, **kwargs):
+    new = instance.tracked_values()
+    old = None if created else getattr(instance, '_tracked_values', None)
+    instance._tracked_values = new
+    if _tracking_deferred.get() or old == new:
+        return
+
+    student, subject, total, grade, term = new
+    if old is None and not created:
+        # Previous values unknown: rebuild rather than guess at a delta.
+        results_changed({student}, {subject})
+        return
+    if old is not None and (old[0], old[1], old[4]) != (student, subject, term):
+        # The result moved to another student, subject or term.
+        results_changed({student, old[0]}, {subject, old[1]})
+        return
+
+    bump_version_on_commit(ranking_label(subject))
+    count, delta, grades = 1, total, Counter({grade: 1})
+    if old is not None:
+        count, delta = 0, total - old[2]
+        grades[old[3]] -= 1
+    if not StudentSummary.objects.apply(student, term, count, delta, grades):
+        StudentSummary.objects.rebuild({student})
+
+@receiver(post_delete, sender=Result)
+def result_deleted(sender, instance, **kwargs):
+    if _tracking_deferred.get():
+        return
+    bump_version_on_commit(ranking_label(instance.subject_id))
+    StudentSummary.objects.apply(instance.student_id, instance.term_id, -1, -instance.total, {instance.grade: -1})
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def bump_subject_version(sender, using=None, **kwargs):
+    bump_version_on_commit(Subject._meta.label, using)
+
+@receiver([post_save, post_delete], sender=Class)
+@receiver(m2m_changed, sender=Class.students.through)
+@receiver(m2m_changed, sender=Class.subjects.through)
+def bump_class_version(sender, action=None, using=None, **kwargs):
+    # m2m_changed fires before and after each change; bump once it is done.
+    if action is None or action.startswith('post_'):
+        bump_version_on_commit(Class._meta.label, using)
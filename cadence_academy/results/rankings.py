@@ -0,0 +1,106 @@
+from django.db.models import Avg, Count, F, Window
+from django.db.models.functions import DenseRank, PercentRank
+
+from django.utils import timezone
+
+from accounts.caching import get_response_cache, get_version
+from .models import ArchivedResult, Class, Result, Subject, Term, ranking_label
+
+RANKING_CACHE_TIMEOUT = 60 * 60
+
+
+def _ranked(rows, score):
+    # Ties share a dense rank ("1, 2, 2, 3") and a percentile, which runs
+    # from 100 for the top score down to 0 for the bottom one.
+    return rows.annotate(
+        rank=Window(DenseRank(), order_by=F(score).desc()),
+        percent_rank=Window(PercentRank(), order_by=F(score).desc()),
+    ).order_by('rank', 'student_id')
+
+
+def _entries(rows, score):
+    return [
+        {
+            'student': row['student_id'],
+            'username': row['student__username'],
+            score: round(float(row[score]), 2),
+            'rank': row['rank'],
+            'percentile': round(100 * (1 - row['percent_rank']), 2),
+            **({'subjects': row['subjects']} if 'subjects' in row else {}),
+        }
+        for row in rows
+    ]
+
+
+def term_results(term_id=None, archived=False):
+    """Results of term ``term_id``, or of the current term when None."""
+    model = ArchivedResult if archived else Result
+    return model.objects.filter(term_id=Term.objects.current_id() if term_id is None else term_id)
+
+
+def subject_ranking(subject_id, class_id=None, term_id=None, archived=False):
+    """Students ranked by their total in one subject and term, optionally within a class."""
+    results = term_results(term_id, archived).filter(subject_id=subject_id)
+    if class_id is not None:
+        results = results.filter(student__student_classes=class_id)
+    rows = _ranked(results.values('student_id', 'student__username', 'total'), 'total')
+    return _entries(rows, 'total')
+
+
+def class_subject_ids(class_id):
+    # A class is ranked on its own subjects, or on every subject if none are set.
+    subject_ids = list(Class.subjects.through.objects.filter(class_id=class_id).values_list('subject_id', flat=True))
+    return subject_ids or list(Subject.objects.values_list('pk', flat=True))
+
+
+def class_ranking(class_id, subject_ids, term_id=None, archived=False):
+    """Students of a class ranked by their average total over ``subject_ids`` in one term."""
+    results = term_results(term_id, archived).filter(student__student_classes=class_id, subject_id__in=subject_ids)
+    rows = results.order_by().values('student_id', 'student__username').annotate(
+        average=Avg('total'), subjects=Count('pk'),
+    )
+    return _entries(_ranked(rows, 'average'), 'average')
+
+
+def cached_ranking(name, labels, build):
+    """
+    Serve a ranking from the cache, keyed on the versions of ``labels``.
+
+    Result writes bump the ranking_label() of their subject and class
+    membership changes bump the Class label, once they commit, so a cached
+    ranking is replaced as soon as anything in its cohort changes.
+    """
+    cache = get_response_cache()
+    versions = ':'.join(str(get_version(label)) for label in labels)
+    key = f'ranking:{name}:{versions}'
+    ranking = cache.get(key)
+    if ranking is None:
+        entries = build()
+        ranking = {'entries': entries, 'positions': {entry['student']: index for index, entry in enumerate(entries)}}
+        cache.set(key, ranking, RANKING_CACHE_TIMEOUT)
+    return ranking
+
+
+def _term_key(term_id, archived):
+    # The current term is keyed by date so a cached ranking does not outlive it.
+    term = f'current@{timezone.localdate().isoformat()}' if term_id is None else term_id
+    return f"{term}:{'archived' if archived else 'live'}"
+
+
+def get_subject_ranking(subject_id, class_id=None, term_id=None, archived=False):
+    labels = [ranking_label(subject_id)]
+    if class_id is not None:
+        labels.append(Class._meta.label)
+    return cached_ranking(
+        f'subject:{subject_id}:{class_id}:{_term_key(term_id, archived)}', labels,
+        lambda: subject_ranking(subject_id, class_id, term_id, archived),
+    )
+
+
+def get_class_ranking(class_id, term_id=None, archived=False):
+    subject_ids = class_subject_ids(class_id)
+    labels = [Class._meta.label, *(ranking_label(subject_id) for subject_id in subject_ids)]
+    return cached_ranking(
+        f'class:{class_id}:{_term_key(term_id, archived)}', labels,
+        lambda: class_ranking(class_id, subject_ids, term_id, archived),
+    )
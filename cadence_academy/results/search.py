@@ -0,0 +1,109 @@
+import re
+from collections import namedtuple
+from functools import reduce
+from operator import and_, or_
+
+from django.db import OperationalError, connections, router
+from django.db.models import Q
+
+from accounts.models import CustomUser
+from .models import Class, Subject
+
+# fts_table: the FTS5 table from migration 0006, whose columns are
+# ``fields`` then ``filters``. Search terms are matched against ``fields``,
+# ranked with bm25 ``weights``; ``filters`` are indexed too so a filter
+# such as role=student is an index intersection rather than a join.
+SearchTarget = namedtuple('SearchTarget', ['model', 'fts_table', 'fields', 'weights', 'filters'])
+
+TARGETS = {
+    'users': SearchTarget(
+        CustomUser, 'search_users', ('username', 'email', 'first_name', 'last_name', 'bio'), (10, 5, 4, 4, 1), ('role',),
+    ),
+    'classes': SearchTarget(Class, 'search_classes', ('name',), (1,), ()),
+    'subjects': SearchTarget(Subject, 'search_subjects', ('name', 'code'), (2, 4), ()),
+}
+
+MIN_QUERY_LENGTH = 2
+MAX_TERMS = 6
+# bm25 is computed for every row it ranks. Whole-word matches are all
+# ranked, but a short prefix can match most of a table, so prefix matches
+# only rank the first MAX_CANDIDATES found.
+MAX_CANDIDATES = 500
+
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(text):
+    return TERM_RE.findall(text.lower())[:MAX_TERMS]
+
+
+def match_expression(target, terms, filters=None, prefix=True):
+    # Every term must match, each as a prefix unless ``prefix`` is False.
+    # Quoting keeps user input from being read as FTS5 syntax (AND, NEAR,
+    # column filters, ...).
+    expression = ' '.join(f'"{term}"*' if prefix else f'"{term}"' for term in terms)
+    if target.filters:
+        expression = f"{{{' '.join(target.fields)}}} : ({expression})"
+    for column, value in (filters or {}).items():
+        value = str(value).replace('"', '""')
+        expression = f'{column} : "{value}" AND {expression}'
+    return expression
+
+
+def _ranked_ids(target, expression, limit, using, candidates=None):
+    table = target.fts_table
+    weights = ', '.join(str(float(weight)) for weight in (*target.weights, *[0] * len(target.filters)))
+    matches = f'SELECT rowid AS id, bm25({table}, {weights}) AS score FROM {table} WHERE {table} MATCH %s'
+    if candidates is not None:
+        matches += f' LIMIT {candidates}'
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT id FROM ({matches}) ORDER BY score, id LIMIT %s', [expression, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fts_ids(target, terms, filters, limit, using):
+    # Whole-word matches come first, so an exact match is never lost among
+    # the prefix matches that fall outside MAX_CANDIDATES.
+    ids = _ranked_ids(target, match_expression(target, terms, filters, prefix=False), limit, using)
+    if len(ids) < limit:
+        prefixed = _ranked_ids(
+            target, match_expression(target, terms, filters), limit + len(ids), using, candidates=MAX_CANDIDATES,
+        )
+        seen = set(ids)
+        ids += [pk for pk in prefixed if pk not in seen][:limit - len(ids)]
+    return ids
+
+
+def _icontains_ids(target, terms, filters, limit, using):
+    matches = [reduce(or_, (Q(**{f'{field}__icontains': term}) for field in target.fields)) for term in terms]
+    queryset = target.model.objects.using(using).filter(reduce(and_, matches), **(filters or {}))
+    return list(queryset.order_by('pk').values_list('pk', flat=True)[:limit])
+
+
+def search(kind, text, limit=20, filters=None):
+    """
+    Objects of ``kind`` (a TARGETS key) matching every term of ``text`` as
+    a prefix, best match first, narrowed by ``filters`` ({column: value}
+    for the target's filter columns). Uses the FTS5 index on SQLite and an
+    icontains scan where that is unavailable.
+    """
+    target = TARGETS[kind]
+    terms = search_terms(text)
+    if not terms:
+        return []
+    using = router.db_for_read(target.model)
+    ids = None
+    if connections[using].vendor == 'sqlite':
+        try:
+            ids = _fts_ids(target, terms, filters, limit, using)
+        except OperationalError:
+            # No FTS5 in this SQLite build, so migration 0006 skipped the index.
+            ids = None
+    if ids is None:
+        ids = _icontains_ids(target, terms, filters, limit, using)
+
+    queryset = target.model.objects.using(using)
+    if target.model is Class:
+        queryset = queryset.select_related('teacher')
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
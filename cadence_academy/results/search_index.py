@@ -0,0 +1,66 @@
+# The FTS5 indexes created by migration 0006 (external content over these
+# tables), kept in step by triggers so raw inserts and bulk writes are
+# indexed too. Changing an index needs a new migration as well as an edit
+# here, which is what repair_search_indexes() checks the triggers against.
+SEARCH_INDEXES = [
+    ('search_users', 'accounts_customuser', ['username', 'email', 'first_name', 'last_name', 'bio', 'role']),
+    ('search_classes', 'results_class', ['name']),
+    ('search_subjects', 'results_subject', ['name', 'code']),
+]
+
+
+def trigger_statements(fts_table, source_table, columns):
+    """``{trigger name: CREATE TRIGGER statement}`` keeping ``fts_table`` in step with ``source_table``."""
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    changed = ' OR '.join(f'old.{column} IS NOT new.{column}' for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f'INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});'
+    return {
+        f'{fts_table}_insert': f'CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {source_table} BEGIN {insert_new} END',
+        f'{fts_table}_delete': f'CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {source_table} BEGIN {delete_old} END',
+        f'{fts_table}_update': (
+            f'CREATE TRIGGER {fts_table}_update AFTER UPDATE OF {column_list} ON {source_table} '
+            f'WHEN {changed} BEGIN {delete_old} {insert_new} END'
+        ),
+    }
+
+
+def rebuild_statement(fts_table):
+    return f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')"
+
+
+def repair_search_indexes(connection):
+    """
+    Recreate sync triggers that are missing and rebuild the indexes they
+    feed. Returns the FTS tables that were repaired.
+
+    The triggers are invisible to Django's migration state, and the SQLite
+    schema editor rebuilds a table (dropping its triggers) for most
+    AlterField/AddField operations, so this runs after every migrate.
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    repaired = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for fts_table, source_table, columns in SEARCH_INDEXES:
+            if fts_table not in existing or source_table not in existing:
+                # Not migrated yet, or skipped for want of FTS5.
+                continue
+            missing = {
+                name: statement for name, statement in trigger_statements(fts_table, source_table, columns).items()
+                if name not in existing
+            }
+            if not missing:
+                continue
+            for statement in missing.values():
+                cursor.execute(statement)
+            # Writes made while a trigger was gone are not in the index.
+            cursor.execute(rebuild_statement(fts_table))
+            repaired.append(fts_table)
+    return repaired
@@ -0,0 +1,186 @@
+import itertools
+import random
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.caching import bump_version_on_commit
+from accounts.models import Class as HomeClass, CustomUser, Profile
+from .models import Class, Result, Subject, Term, calculate_grade, results_changed
+
+SchoolSize = namedtuple('SchoolSize', ['students', 'teachers', 'admins', 'subjects', 'class_size', 'subjects_per_class'])
+SeededSchool = namedtuple(
+    'SeededSchool', ['admins', 'teachers', 'students', 'subjects', 'classes', 'home_classes', 'terms', 'results'],
+)
+
+# Every student gets a result in each subject their class takes, in every
+# seeded term, so results = students * subjects_per_class * terms.
+SCHOOL_SIZES = {
+    'small': SchoolSize(students=400, teachers=20, admins=2, subjects=10, class_size=30, subjects_per_class=6),
+    'medium': SchoolSize(students=5000, teachers=200, admins=5, subjects=20, class_size=30, subjects_per_class=8),
+    'large': SchoolSize(students=50000, teachers=1500, admins=10, subjects=30, class_size=35, subjects_per_class=10),
+    'huge': SchoolSize(students=100000, teachers=3000, admins=20, subjects=30, class_size=35, subjects_per_class=10),
+}
+
+DEFAULT_PASSWORD = 'cadence-seed'
+BATCH_SIZE = 10000
+# Longest prefix that still fits Subject.code (max_length=10) after "S" and three digits.
+MAX_PREFIX_LENGTH = 6
+
+FIRST_NAMES = ['Ada', 'Bola', 'Chidi', 'Dayo', 'Efe', 'Funmi', 'Gbenga', 'Halima', 'Ife', 'Jide', 'Kemi', 'Lola', 'Musa', 'Ngozi']
+LAST_NAMES = ['Adeyemi', 'Bello', 'Chukwu', 'Danjuma', 'Eze', 'Fashola', 'Garba', 'Ibrahim', 'Okafor', 'Usman', 'Yusuf']
+
+# Score columns are generated in half points: (column, maximum score).
+SCORE_RANGES = (('first_test_score', 20), ('second_test_score', 20), ('exam_score', 60))
+
+
+def _insert(cursor, model, fields, rows, batch_size):
+    """executemany() ``rows`` into ``model``'s table in batches. Returns the row count."""
+    opts = model._meta
+    qn = connection.ops.quote_name
+    columns = [opts.get_field(name).column for name in fields]
+    sql = (
+        f"INSERT INTO {qn(opts.db_table)} ({', '.join(qn(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    rows, count = iter(rows), 0
+    while batch := list(itertools.islice(rows, batch_size)):
+        cursor.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def _last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def _new_pks(model, after, **filters):
+    return list(model.objects.filter(pk__gt=after, **filters).order_by('pk').values_list('pk', flat=True))
+
+
+def _half_points(value):
+    return connection.ops.adapt_decimalfield_value(Decimal(value) / 2, 5, 2)
+
+
+def _recent_terms(count):
+    # The current term and the count - 1 before it, oldest first.
+    terms = [Term.objects.current()]
+    while len(terms) < count:
+        terms.append(Term.objects.for_date(terms[-1].starts_on - timedelta(days=1)))
+    return terms[::-1]
+
+
+def _recorded_stamps(rng, term, now, days):
+    # Within the term, and within the last ``days`` days for the current one.
+    start = timezone.make_aware(datetime.combine(term.starts_on, time.min))
+    end = min(now, timezone.make_aware(datetime.combine(term.ends_on + timedelta(days=1), time.min)))
+    if end == now:
+        start = max(start, now - timedelta(days=days))
+    seconds = max(1, int((end - start).total_seconds()))
+    return [connection.ops.adapt_datetimefield_value(start + timedelta(seconds=rng.randrange(seconds))) for _ in range(1024)]
+
+
+def seed_school(size, seed=0, password=DEFAULT_PASSWORD, prefix='', days=120, terms=1, batch_size=BATCH_SIZE, progress=None):
+    """
+    Insert a synthetic school of ``size``: users with profiles, subjects,
+    classes (results and accounts) with rosters, and one result per student
+    per class subject in each of the last ``terms`` terms. The same ``seed``
+    always produces the same school.
+
+    Rows go in with batched executemany() and no per-row signals or
+    password hashing; summaries and cache versions are brought up to date
+    once at the end, as a bulk write through ResultQuerySet would.
+    """
+    progress = progress or (lambda message: None)
+    rng = random.Random(seed)
+    now = timezone.now()
+    stamp = connection.ops.adapt_datetimefield_value(now)
+    # One hash for everyone: hashing per user would take hours at scale.
+    password_hash = make_password(password)
+    thumbnails = CustomUser._meta.get_field('profile_picture_thumbnails').get_db_prep_save({}, connection)
+    # Each possible score in half points, adapted once, and the grade of each total.
+    scores = [_half_points(points) for points in range(2 * 100 + 1)]
+    grades = [calculate_grade(Decimal(points) / 2) for points in range(2 * 100 + 1)]
+    seeded_terms = _recent_terms(terms)
+    recorded = {term.pk: _recorded_stamps(rng, term, now, days) for term in seeded_terms}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        ids = {}
+        for role, count in (('admin', size.admins), ('teacher', size.teachers), ('student', size.students)):
+            last = _last_pk(CustomUser)
+            _insert(cursor, CustomUser, (
+                'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+                'is_staff', 'is_active', 'date_joined', 'role', 'profile_picture_thumbnails', 'updated_at',
+            ), (
+                (password_hash, False, f'{prefix}{role}{index}', rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                 f'{prefix}{role}{index}@example.com', role == 'admin', True, stamp, role, thumbnails, stamp)
+                for index in range(1, count + 1)
+            ), batch_size)
+            ids[role] = _new_pks(CustomUser, last, role=role)
+            _insert(cursor, Profile, ('user', 'updated_at'), ((pk, stamp) for pk in ids[role]), batch_size)
+            progress(f'{count} {role}s')
+
+        last = _last_pk(Subject)
+        _insert(cursor, Subject, ('name', 'code', 'updated_at'), (
+            (f'Subject {index}', f'{prefix}S{index:03d}', stamp) for index in range(1, size.subjects + 1)
+        ), batch_size)
+        subjects = _new_pks(Subject, last)
+
+        teachers = ids['teacher'] or [None]
+        class_count = -(-size.students // size.class_size)
+        class_names = [f'{prefix}Class {index}' for index in range(1, class_count + 1)]
+        class_teachers = [teachers[index % len(teachers)] for index in range(class_count)]
+        last = _last_pk(Class)
+        _insert(cursor, Class, ('name', 'teacher'), zip(class_names, class_teachers), batch_size)
+        classes = _new_pks(Class, last)
+        last = _last_pk(HomeClass)
+        _insert(cursor, HomeClass, ('name', 'teacher'), zip(class_names, class_teachers), batch_size)
+        home_classes = _new_pks(HomeClass, last)
+
+        per_class = min(size.subjects_per_class, len(subjects))
+        class_subjects = [sorted(rng.sample(subjects, per_class)) for _ in classes]
+        _insert(cursor, Class.subjects.through, ('class', 'subject'), (
+            (class_id, subject_id) for class_id, subject_ids in zip(classes, class_subjects) for subject_id in subject_ids
+        ), batch_size)
+        students = ids['student']
+        _insert(cursor, Class.students.through, ('class', 'customuser'), (
+            (classes[index // size.class_size], student) for index, student in enumerate(students)
+        ), batch_size)
+        progress(f'{len(subjects)} subjects, {len(classes)} classes')
+
+        # A per-student ability keeps each transcript consistent across terms.
+        abilities = [rng.uniform(0.45, 0.98) for _ in students]
+
+        def result_rows():
+            for term in seeded_terms:
+                for index, student in enumerate(students):
+                    for subject_id in class_subjects[index // size.class_size]:
+                        points = [
+                            min(2 * maximum, max(0, round(2 * maximum * (abilities[index] + rng.gauss(0, 0.12)))))
+                            for _, maximum in SCORE_RANGES
+                        ]
+                        total = sum(points)
+                        yield (
+                            student, subject_id, term.pk, scores[points[0]], scores[points[1]], scores[points[2]],
+                            scores[total], grades[total], rng.choice(recorded[term.pk]), stamp,
+                        )
+
+        result_count = _insert(cursor, Result, (
+            'student', 'subject', 'term', 'first_test_score', 'second_test_score', 'exam_score',
+            'total', 'grade', 'date_recorded', 'updated_at',
+        ), result_rows(), batch_size)
+        progress(f'{result_count} results')
+
+        results_changed(students, subjects)
+    for label in (Subject._meta.label, Class._meta.label, HomeClass._meta.label):
+        bump_version_on_commit(label)
+
+    return SeededSchool(
+        ids['admin'], ids['teacher'], students, subjects, classes, home_classes,
+        [term.pk for term in seeded_terms], result_count,
+    )
@@ -1,18 +1,19 @@
 from rest_framework import serializers
-from .models import Subject, Class, Result
+from .models import Subject, Class, Result, StudentSummary, Term
 from accounts.models import CustomUser
+from accounts.mixins import DynamicFieldsMixin
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = ['id', 'name', 'code']
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser  # Adjust this if your student model is different
         fields = ['id', 'username', 'email']  # Add other fields as needed
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     students = StudentSerializer(many=True, read_only=True)
     subjects = SubjectSerializer(many=True, read_only=True)
     teacher = serializers.CharField(source='teacher.username', read_only=True)
@@ -20,6 +21,8 @@ class ClassSerializer(serializers.ModelSerializer):
     class Meta:
         model = Class
         fields = ['id', 'name', 'teacher', 'students', 'subjects']
+        # Rosters are only embedded on request, e.g. ?expand=students,subjects
+        expandable_fields = ['students', 'subjects']
 
     def create(self, validated_data):
         return Class.objects.create(**validated_data)
@@ -36,17 +39,34 @@ class ClassSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class ResultSerializer(serializers.ModelSerializer):
+class TermSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Term
+        fields = ['id', 'name', 'starts_on', 'ends_on', 'archived_at']
+
+class ResultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer()
     subject = SubjectSerializer()
-    total_score = serializers.FloatField(read_only=True)
+    # Results are always written to the current term.
+    term = serializers.PrimaryKeyRelatedField(read_only=True)
+    total_score = serializers.FloatField(source='total', read_only=True)
     grade = serializers.CharField(read_only=True)
     remark = serializers.CharField(read_only=True)
 
     class Meta:
         model = Result
         fields = [
-            'id', 'student', 'subject', 'first_test_score',
+            'id', 'student', 'subject', 'term', 'first_test_score',
             'second_test_score', 'exam_score', 'total_score',
             'grade', 'remark', 'date_recorded'
         ]
+
+class StudentSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    average = serializers.FloatField(read_only=True)
+    total_score = serializers.FloatField(source='total_sum', read_only=True)
+    grades = serializers.DictField(source='grade_counts', read_only=True)
+    subjects_passed = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = StudentSummary
+        fields = ['student', 'term', 'result_count', 'total_score', 'average', 'grades', 'subjects_passed', 'updated_at']
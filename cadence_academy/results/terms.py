@@ -0,0 +1,32 @@
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.conf import settings
+
+DEFAULT_ACADEMIC_CALENDAR = {
+    # (name, month, day) each term starts on, in session order. A term runs
+    # until the next one starts, and the first term starts the session.
+    'TERMS': [('First Term', 9, 1), ('Second Term', 1, 6), ('Third Term', 4, 22)],
+}
+
+TermBounds = namedtuple('TermBounds', ['name', 'starts_on', 'ends_on'])
+
+
+def _calendar_setting(name):
+    return getattr(settings, 'ACADEMIC_CALENDAR', {}).get(name, DEFAULT_ACADEMIC_CALENDAR[name])
+
+
+def term_bounds(day):
+    """The calendar term containing ``day``: its name, first and last day."""
+    terms = _calendar_setting('TERMS')
+    session_start = tuple(terms[0][1:])
+    first_year = day.year if (day.month, day.day) >= session_start else day.year - 1
+    starts = [
+        (name, date(first_year if (month, start_day) >= session_start else first_year + 1, month, start_day))
+        for name, month, start_day in terms
+    ]
+    starts.append((None, date(first_year + 1, *session_start)))
+    for (name, starts_on), (_, next_starts_on) in zip(starts, starts[1:]):
+        if starts_on <= day < next_starts_on:
+            return TermBounds(f'{first_year}/{first_year + 1} {name}', starts_on, next_starts_on - timedelta(days=1))
+    raise ValueError(f'ACADEMIC_CALENDAR terms do not cover {day}.')
@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from collections import Counter
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework.serializers import Serializer
+from rest_framework.views import APIView
+
+from accounts.models import CustomUser, Class as HomeClass
+from accounts.pagination import IdCursorPagination
+from accounts.caching import bump_version, get_version
+from cadence_academy.instrumentation import Histogram, registry
+from cadence_academy.replicas import ReadReplicaMiddleware, sync_replica
+from . import analytics
+from .bulk import upsert_results
+from .models import ArchivedResult, Subject, Class, Result, StudentSummary, Term, calculate_grade
+from .search_index import SEARCH_INDEXES, repair_search_indexes
+from .terms import term_bounds
+from .views import ResultViewSet
+
+
+def seed_school(teachers=3, students_per_class=10, subjects=5):
+    """Build a small but realistic school: classes with rosters, subjects and a full result sheet."""
+    admin = CustomUser.objects.create(username='admin', email='admin@example.com', role='admin')
+    subject_list = [
+        Subject.objects.create(name=f'Subject {i}', code=f'SUB{i:03d}')
+        for i in range(subjects)
+    ]
+    classes = []
+    for t in range(teachers):
+        teacher = CustomUser.objects.create(username=f'teacher{t}', email=f'teacher{t}@example.com', role='teacher')
+        HomeClass.objects.create(name=f'Home Room {t}', teacher=teacher)
+        school_class = Class.objects.create(name=f'Class {t}', teacher=teacher)
+        school_class.subjects.set(subject_list)
+        roster = [
+            CustomUser.objects.create(username=f'student{t}_{s}', email=f'student{t}_{s}@example.com', role='student')
+            for s in range(students_per_class)
+        ]
+        school_class.students.set(roster)
+        Result.objects.bulk_create([
+            Result(
+                student=student,
+                subject=subject,
+                first_test_score=Decimal('15.00'),
+                second_test_score=Decimal('12.50'),
+                exam_score=Decimal(40 + (i * 7 + j) % 30),
+            )
+            for i, student in enumerate(roster)
+            for j, subject in enumerate(subject_list)
+        ])
+        classes.append(school_class)
+    return admin, classes
+
+
+class QueryBudgetTests(APITestCase):
+    # Maximum number of SQL queries each endpoint may issue, independent of how
+    # many rows are returned. Authentication is forced so only endpoint work counts.
+    # Conditional-GET detail endpoints spend one extra lookup on their validators.
+    BUDGETS = {
+        'result-list': 1,
+        'result-detail': 2,
+        'class-list': 3,
+        'class-detail': 3,
+        'subject-list': 1,
+        'subject-detail': 1,
+        'home-class-list': 1,
+        'home-class-detail': 1,
+        'teacher-list': 1,
+        'student-list': 1,
+        'profile_detail': 2,
+        'admin_profile_detail': 1,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school()
+        cls.student = CustomUser.objects.filter(role='student').first()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def assertWithinBudget(self, name, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(
+            len(queries), self.BUDGETS[name],
+            f'{name} issued {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries),
+        )
+        return response
+
+    def test_results_endpoints(self):
+        response = self.assertWithinBudget('result-list', '/api/results/')
+        self.assertEqual(len(response.data['results']), 50)
+        result = Result.objects.first()
+        self.assertWithinBudget('result-detail', f'/api/results/{result.pk}/')
+
+    def test_class_endpoints(self):
+        response = self.assertWithinBudget('class-list', '/api/classes/?expand=students,subjects')
+        self.assertEqual(len(response.data['results']), len(self.classes))
+        self.assertWithinBudget('class-detail', f'/api/classes/{self.classes[0].pk}/?expand=students,subjects')
+
+    def test_subject_endpoints(self):
+        self.assertWithinBudget('subject-list', '/api/subjects/')
+        self.assertWithinBudget('subject-detail', f'/api/subjects/{Subject.objects.first().pk}/')
+
+    def test_accounts_endpoints(self):
+        # The results router also registers 'class-list', so address these by path.
+        self.assertWithinBudget('home-class-list', '/api/accounts/classes/')
+        home_class = HomeClass.objects.first()
+        self.assertWithinBudget('home-class-detail', f'/api/accounts/classes/{home_class.pk}/')
+        self.assertWithinBudget('teacher-list', reverse('teacher-list'))
+        self.assertWithinBudget('student-list', reverse('student-list'))
+
+    def test_profile_endpoints(self):
+        self.assertWithinBudget('profile_detail', reverse('profile_detail', kwargs={'user_id': self.student.pk}))
+        self.assertWithinBudget('admin_profile_detail', reverse('admin_profile_detail', kwargs={'user_id': self.student.pk}))
+
+
+class ResultDerivedFieldTests(APITestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create(username='student', email='student@example.com')
+        self.subject = Subject.objects.create(name='Mathematics', code='MATH101')
+
+    def test_save_stores_total_and_grade(self):
+        result = Result.objects.create(
+            student=self.student, subject=self.subject,
+            first_test_score=Decimal('29.70'), second_test_score=Decimal('30.20'), exam_score=Decimal('30.10'),
+        )
+        result.refresh_from_db()
+        self.assertEqual(result.total, Decimal('90.00'))
+        self.assertEqual(result.grade, 'A')
+        self.assertEqual(result.remark(), 'Distinction')
+
+    def test_queryset_update_recomputes_in_sql(self):
+        result = Result.objects.create(student=self.student, subject=self.subject, exam_score=Decimal('50'))
+        Result.objects.filter(exam_score__lt=60).update(exam_score=Decimal('75'))
+        result.refresh_from_db()
+        self.assertEqual(result.total, Decimal('75.00'))
+        self.assertEqual(result.grade, 'C')
+
+    def test_bulk_writes_keep_derived_fields(self):
+        other = Subject.objects.create(name='English', code='ENG101')
+        Result.objects.bulk_create([
+            Result(student=self.student, subject=self.subject, exam_score=Decimal('85')),
+            Result(student=self.student, subject=other, exam_score=Decimal('40')),
+        ])
+        self.assertEqual(
+            list(Result.objects.filter(subject__code='MATH101', grade='B').values_list('total', flat=True)),
+            [Decimal('85.00')],
+        )
+        results = list(Result.objects.order_by('total'))
+        results[0].exam_score = Decimal('95')
+        Result.objects.bulk_update(results[:1], ['exam_score'])
+        self.assertEqual(Result.objects.get(subject=other).grade, 'A')
+
+    def test_serializer_reads_stored_values(self):
+        result = Result.objects.create(student=self.student, subject=self.subject, exam_score=Decimal('65'))
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(f'/api/results/{result.pk}/', format='json')
+        self.assertEqual(response.data['total_score'], 65.0)
+        self.assertEqual(response.data['grade'], 'D')
+        self.assertEqual(response.data['remark'], 'Pass')
+
+
+class BulkUpsertTests(APITestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create(username='teacher', email='teacher@example.com', role='teacher')
+        self.students = [
+            CustomUser.objects.create(username=f'student{i}', email=f'student{i}@example.com')
+            for i in range(3)
+        ]
+        self.math = Subject.objects.create(name='Mathematics', code='MATH101')
+        self.english = Subject.objects.create(name='English', code='ENG101')
+        self.client.force_authenticate(user=self.teacher)
+        self.url = reverse('result-bulk-upsert')
+
+    def test_inserts_and_updates_in_one_request(self):
+        existing = Result.objects.create(student=self.students[0], subject=self.math, exam_score=Decimal('10'))
+        rows = [
+            {'student': student.pk, 'subject': subject.pk, 'first_test_score': '10', 'second_test_score': '15', 'exam_score': '60'}
+            for student in self.students
+            for subject in (self.math, self.english)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 5, 'updated': 1})
+        # Validation, existing-key lookup, the upsert and the summary rebuild,
+        # independent of row count.
+        self.assertLessEqual(len(queries), 11)
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.total, Decimal('85.00'))
+        self.assertEqual(existing.grade, 'B')
+        self.assertEqual(Result.objects.count(), 6)
+
+    def test_reports_errors_per_row_and_writes_nothing(self):
+        rows = [
+            {'student': self.students[0].pk, 'subject': self.math.pk, 'exam_score': '70'},
+            {'student': 9999, 'subject': self.math.pk, 'exam_score': '70'},
+            {'student': self.students[1].pk, 'subject': self.english.pk, 'exam_score': 'abc'},
+            {'student': self.students[0].pk, 'subject': self.math.pk, 'exam_score': '71'},
+        ]
+        response = self.client.post(self.url, {'results': rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('student', response.data['errors'][0]['errors'])
+        self.assertIn('exam_score', response.data['errors'][1]['errors'])
+        self.assertIn('non_field_errors', response.data['errors'][2]['errors'])
+        self.assertFalse(Result.objects.exists())
+
+
+class PaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=2, students_per_class=5, subjects=3)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def test_walks_results_newest_first_with_cursor(self):
+        seen = []
+        url = '/api/results/?page_size=7'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 1)
+            self.assertNotIn('OFFSET', queries[0]['sql'])
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, list(Result.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(IdCursorPagination, 'max_page_size', 4):
+            response = self.client.get(reverse('student-list'), {'page_size': 100000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNotNone(response.data['next'])
+
+
+class DynamicFieldsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=2, students_per_class=4, subjects=2)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def test_class_rosters_are_opt_in(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/classes/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'teacher'})
+
+        response = self.client.get('/api/classes/', {'expand': 'students'})
+        row = response.data['results'][0]
+        self.assertEqual(len(row['students']), 4)
+        self.assertNotIn('subjects', row)
+
+    def test_fields_skips_unrequested_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/results/', {'fields': 'id,grade'})
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'grade'})
+
+        response = self.client.get('/api/classes/', {'fields': 'name', 'expand': 'subjects'})
+        self.assertEqual(set(response.data['results'][0]), {'name'})
+
+    def test_accounts_serializers_accept_fields(self):
+        response = self.client.get(reverse('student-list'), {'fields': 'username'})
+        self.assertEqual(set(response.data['results'][0]), {'username'})
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create(username='admin', email='admin@example.com', role='admin')
+        Subject.objects.create(name='Mathematics', code='MATH101')
+        self.client.force_authenticate(user=self.admin)
+
+    def test_subject_list_served_from_cache_until_changed(self):
+        self.client.get('/api/subjects/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/subjects/')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(response.data['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name='English', code='ENG101')
+        response = self.client.get('/api/subjects/')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_versions_are_bumped_once_committed(self):
+        version = get_version('results.Subject')
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name='English', code='ENG101')
+            # A reader before the commit still sees the old rows, so it must
+            # not be able to cache them under a new version.
+            self.assertEqual(get_version('results.Subject'), version)
+        self.assertNotEqual(get_version('results.Subject'), version)
+
+    def test_bump_writes_a_new_version_without_reading(self):
+        version = get_version('results.Subject')
+        with mock.patch.object(cache, 'incr', side_effect=AssertionError('incr is not atomic on every backend')):
+            bump_version('results.Subject')
+            bumped = get_version('results.Subject')
+            bump_version('results.Subject')
+        self.assertNotIn(bumped, (version, get_version('results.Subject')))
+
+    def test_class_list_invalidated_by_save_and_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            home_class = HomeClass.objects.create(name='Home Room')
+        self.assertEqual(self.client.get('/api/accounts/classes/').data['results'][0]['name'], 'Home Room')
+        home_class.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            home_class.save()
+        self.assertEqual(self.client.get('/api/accounts/classes/').data['results'][0]['name'], 'Renamed')
+        with self.captureOnCommitCallbacks(execute=True):
+            home_class.delete()
+        self.assertEqual(self.client.get('/api/accounts/classes/').data['results'], [])
+
+    def test_roster_changes_bump_class_version(self):
+        school_class = Class.objects.create(name='JSS1')
+        version = get_version('results.Class')
+        with self.captureOnCommitCallbacks(execute=True):
+            school_class.students.add(self.admin)
+        self.assertNotEqual(get_version('results.Class'), version)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'cadence-academy-test-cache'),
+    }})
+    def test_works_with_file_based_cache(self):
+        cache.clear()
+        self.client.get('/api/subjects/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/subjects/')
+        self.assertEqual(len(queries), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name='English', code='ENG101')
+        self.assertEqual(len(self.client.get('/api/subjects/').data['results']), 2)
+        cache.clear()
+
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=1, students_per_class=3, subjects=2)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def assertNotModified(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+
+    def test_result_list_and_detail_answer_304_until_changed(self):
+        result = Result.objects.first()
+        response = self.client.get('/api/results/')
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotModified('/api/results/', response['ETag'])
+        response = self.client.get(f'/api/results/{result.pk}/')
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(f'/api/results/{result.pk}/', response['ETag'])
+
+        response = self.client.get('/api/results/')
+        Result.objects.filter(pk=result.pk).update(exam_score=Decimal('99'))
+        changed = self.client.get('/api/results/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_renaming_the_student_or_subject_changes_etag(self):
+        result = Result.objects.select_related('student', 'subject').order_by('pk').first()
+        for url in ('/api/results/', f'/api/results/{result.pk}/'):
+            etag = self.client.get(url)['ETag']
+            result.student.username += 'x'
+            result.student.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            result.subject.name += 'x'
+            result.subject.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+
+    def test_deleting_a_result_changes_list_etag(self):
+        etag = self.client.get('/api/results/')['ETag']
+        Result.objects.order_by('pk').first().delete()
+        self.assertEqual(self.client.get('/api/results/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_list_validators_cover_the_page_only(self):
+        url = '/api/results/?page_size=2'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 1)
+        page = [row['id'] for row in response.data['results']]
+        # A row beyond the page leaves it unchanged; one on it does not.
+        Result.objects.exclude(pk__in=page).order_by('pk').first().delete()
+        self.assertNotModified(url, response['ETag'])
+        Result.objects.filter(pk=page[0]).update(exam_score=Decimal('99'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+
+    def test_profile_detail_answers_304_until_profile_changes(self):
+        student = CustomUser.objects.filter(role='student').first()
+        url = reverse('profile_detail', kwargs={'user_id': student.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        student.profile.country = 'Ghana'
+        student.profile.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class ResultExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=1, students_per_class=3, subjects=2)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def test_csv_export_streams_every_result(self):
+        response = self.client.get('/api/results/export/csv/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[-2:], ['date_recorded', 'remark'])
+        self.assertEqual(len(lines), Result.objects.count() + 1)
+
+    def test_ndjson_export_includes_grade_and_remark(self):
+        response = self.client.get('/api/results/export/ndjson/')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        first = Result.objects.order_by('pk').first()
+        self.assertEqual(len(rows), Result.objects.count())
+        self.assertEqual(rows[0]['id'], first.pk)
+        self.assertEqual(rows[0]['grade'], first.grade)
+        self.assertEqual(rows[0]['remark'], first.remark())
+
+
+class ResultStatisticsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=2, students_per_class=6, subjects=3)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def test_matches_row_by_row_computation(self):
+        response = self.client.get('/api/results/statistics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = list(Result.objects.all())
+        totals = [float(result.total_score()) for result in results]
+        self.assertEqual(response.data['count'], len(results))
+        self.assertAlmostEqual(response.data['mean'], statistics.fmean(totals), places=2)
+        self.assertAlmostEqual(response.data['median'], statistics.median(totals), places=2)
+        self.assertAlmostEqual(response.data['std'], statistics.pstdev(totals), places=2)
+        quartiles = statistics.quantiles(totals, n=4, method='inclusive')
+        self.assertAlmostEqual(response.data['percentiles']['p25'], quartiles[0], places=2)
+        self.assertAlmostEqual(response.data['percentiles']['p75'], quartiles[2], places=2)
+        grades = Counter(calculate_grade(result.total_score()) for result in results)
+        self.assertEqual({grade: data['count'] for grade, data in response.data['grades'].items()},
+                         {grade: grades.get(grade, 0) for grade in 'ABCDF'})
+        self.assertEqual(sum(bucket['count'] for bucket in response.data['histogram']), len(results))
+
+    def test_python_fallback_agrees_with_numpy(self):
+        with_numpy = self.client.get('/api/results/statistics/?bins=7').data
+        with mock.patch.object(analytics, 'np', None):
+            without_numpy = self.client.get('/api/results/statistics/?bins=7').data
+        self.assertEqual(with_numpy, without_numpy)
+
+    def test_scoped_to_class_and_subject(self):
+        school_class = self.classes[0]
+        subject = Subject.objects.first()
+        response = self.client.get(f'/api/results/statistics/?class={school_class.pk}&subject={subject.pk}')
+        expected = Result.objects.filter(student__student_classes=school_class, subject=subject).count()
+        self.assertEqual(response.data['count'], expected)
+
+    def test_empty_scope_and_invalid_parameters(self):
+        response = self.client.get('/api/results/statistics/?date_from=2000-01-01&date_to=2000-01-31')
+        self.assertEqual(response.data['count'], 0)
+        self.assertIsNone(response.data['mean'])
+        response = self.client.get('/api/results/statistics/?subject=x&date_from=soon&bins=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'subject', 'date_from', 'bins'})
+
+
+class ResultFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=2, students_per_class=4, subjects=3)
+        cls.subject = Subject.objects.order_by('pk').first()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def ids(self, query):
+        response = self.client.get(f'/api/results/?page_size=500&{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return {row['id'] for row in response.data['results']}
+
+    def test_class_and_subject_is_one_query(self):
+        school_class = self.classes[0]
+        expected = set(Result.objects.filter(student__student_classes=school_class, subject=self.subject).values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.ids(f'class={school_class.pk}&subject={self.subject.pk}'), expected)
+        self.assertEqual(len(queries), 1)
+
+    def test_class_limits_to_its_subjects(self):
+        school_class = self.classes[0]
+        school_class.subjects.set([self.subject])
+        expected = set(Result.objects.filter(student__student_classes=school_class, subject=self.subject).values_list('pk', flat=True))
+        self.assertEqual(self.ids(f'class={school_class.pk}'), expected)
+
+    def test_grade_and_total_ranges(self):
+        for grade in 'ABCDF':
+            expected = set(Result.objects.filter(subject=self.subject, grade=grade).values_list('pk', flat=True))
+            self.assertEqual(self.ids(f'subject={self.subject.pk}&grade={grade.lower()}'), expected)
+        expected = set(Result.objects.filter(subject=self.subject, total__gte=70, total__lte=80).values_list('pk', flat=True))
+        self.assertEqual(self.ids(f'subject={self.subject.pk}&total_min=70&total_max=80'), expected)
+
+    def test_date_range_is_inclusive_of_whole_days(self):
+        result = Result.objects.first()
+        Result.objects.filter(pk=result.pk).update(date_recorded=datetime(2024, 3, 10, 23, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.ids('date_from=2024-03-10&date_to=2024-03-10'), {result.pk})
+        self.assertEqual(self.ids('date_from=2024-03-11&date_to=2024-03-31'), set())
+
+    def test_open_ended_date_ranges_are_capped(self):
+        first, second = Result.objects.order_by('pk')[:2]
+        Result.objects.filter(pk=first.pk).update(date_recorded=datetime(2023, 3, 10, 12, tzinfo=dt_timezone.utc))
+        Result.objects.filter(pk=second.pk).update(date_recorded=datetime(2024, 3, 9, 12, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.ids('term=all&date_from=2023-03-10'), {first.pk, second.pk})
+        self.assertEqual(self.ids('term=all&date_from=2023-03-09'), {first.pk})
+        self.assertEqual(self.ids('term=all&date_to=2024-03-09'), {first.pk, second.pk})
+        self.assertEqual(self.ids('term=all&date_to=2024-03-10'), {second.pk})
+
+    def test_unanchored_and_invalid_filters_are_rejected(self):
+        for query, field in [
+            ('grade=A', 'non_field_errors'),
+            ('total_min=50', 'non_field_errors'),
+            ('grade=Z&subject=1', 'grade'),
+            ('student=0', 'student'),
+            ('class=abc', 'class'),
+            ('subject=1&total_min=80&total_max=70', 'total_max'),
+            ('subject=1&total_max=NaN', 'total_max'),
+            ('date_from=2020-01-01&date_to=2023-01-01', 'date_to'),
+            ('date_from=2024-02-01&date_to=2024-01-01', 'date_to'),
+        ]:
+            response = self.client.get(f'/api/results/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertIn(field, response.data, query)
+
+
+class SearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=2, students_per_class=3, subjects=3)
+        cls.okafor = CustomUser.objects.create(
+            username='nokafor', email='ngozi@example.com', first_name='Ngozi', last_name='Okafor', role='student',
+        )
+        cls.okoro = CustomUser.objects.create(
+            username='tokoro', email='tunde@example.com', first_name='Tunde', last_name='Okoro', role='teacher',
+            bio='Teaches Okafor family twins',
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def search(self, query):
+        response = self.client.get(f'/api/search/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def usernames(self, query):
+        return [user['username'] for user in self.search(f'type=users&{query}')['users']]
+
+    def test_prefix_match_ranked_by_field(self):
+        # A last-name match outranks the same word in a bio.
+        self.assertEqual(self.usernames('q=okaf'), ['nokafor', 'tokoro'])
+        self.assertEqual(self.usernames('q=ngozi oka'), ['nokafor'])
+        self.assertEqual(self.usernames('q=oka&role=teacher'), ['tokoro'])
+
+    def test_whole_word_match_beyond_the_prefix_candidates(self):
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'ann{i}', email=f'ann{i}@example.com', role='student') for i in range(600)
+        ])
+        CustomUser.objects.create(username='ann', email='a.n@example.com', role='student')
+        self.assertEqual(self.usernames('q=ann&limit=5')[0], 'ann')
+        self.assertEqual(len(self.usernames('q=ann&limit=5')), 5)
+
+    def test_searches_classes_and_subjects(self):
+        data = self.search('q=class 1')
+        self.assertEqual([row['name'] for row in data['classes']], ['Class 1'])
+        self.assertEqual([row['teacher'] for row in data['classes']], ['teacher1'])
+        self.assertEqual([row['code'] for row in self.search('q=sub002&type=subjects')['subjects']], ['SUB002'])
+        self.assertNotIn('users', self.search('q=sub&type=subjects'))
+
+    def test_index_follows_updates_and_deletes(self):
+        CustomUser.objects.filter(pk=self.okafor.pk).update(last_name='Adeyemi')
+        self.assertEqual(self.usernames('q=okaf'), ['tokoro'])
+        self.assertEqual(self.usernames('q=adeyemi'), ['nokafor'])
+        self.okoro.delete()
+        self.assertEqual(self.usernames('q=okaf'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.usernames('q=okafor OR NEAR("x"'), [])
+        self.assertEqual(self.usernames('q=last_name: okafor'), [])
+
+    def test_falls_back_to_icontains(self):
+        from . import search
+        with mock.patch.object(search, '_fts_ids', side_effect=search.OperationalError('no such module: fts5')):
+            self.assertEqual(self.usernames('q=okaf&role=student'), ['nokafor'])
+
+    def test_invalid_parameters(self):
+        for query, field in [('q=a', 'q'), ('q=ok&type=rooms', 'type'), ('q=ok&role=parent', 'role'), ('q=ok&limit=0', 'limit')]:
+            response = self.client.get(f'/api/search/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertIn(field, response.data, query)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.okoro)
+        self.assertEqual(self.client.get('/api/search/?q=ok').status_code, status.HTTP_403_FORBIDDEN)
+
+    def search_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'search_%'")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_triggers_exist_after_migrate(self):
+        expected = {
+            f'{fts_table}_{event}' for fts_table, _, _ in SEARCH_INDEXES for event in ('insert', 'delete', 'update')
+        }
+        self.assertEqual(self.search_triggers(), expected)
+
+    def test_missing_triggers_are_recreated(self):
+        # What the SQLite schema editor leaves behind after rebuilding the table.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER search_users_insert')
+            cursor.execute('DROP TRIGGER search_users_update')
+        CustomUser.objects.filter(pk=self.okafor.pk).update(last_name='Adeyemi')
+        CustomUser.objects.create(username='bbello', last_name='Bello', role='student')
+
+        self.assertEqual(repair_search_indexes(connection), ['search_users'])
+        self.assertIn('search_users_insert', self.search_triggers())
+        self.assertEqual(self.usernames('q=adeyemi'), ['nokafor'])
+        self.assertEqual(self.usernames('q=bello'), ['bbello'])
+        self.assertEqual(self.usernames('q=okaf'), ['tokoro'])
+        self.assertEqual(repair_search_indexes(connection), [])
+
+
+class StudentSummaryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.classes = seed_school(teachers=1, students_per_class=3, subjects=3)
+        cls.student = cls.classes[0].students.order_by('pk').first()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def assertSummaryMatchesResults(self, student):
+        summaries = {summary.term_id: summary for summary in StudentSummary.objects.filter(student=student)}
+        terms = set(Result.objects.filter(student=student).values_list('term_id', flat=True))
+        self.assertEqual(set(summaries), terms)
+        for term, summary in summaries.items():
+            results = list(Result.objects.filter(student=student, term=term))
+            self.assertEqual(summary.result_count, len(results))
+            self.assertEqual(summary.total_sum, sum(result.total for result in results))
+            self.assertEqual(summary.grade_counts, {grade: sum(r.grade == grade for r in results) for grade in 'ABCDF'})
+
+    def test_kept_in_step_by_single_writes(self):
+        result = Result.objects.filter(student=self.student).first()
+        result.exam_score = Decimal('60')
+        result.first_test_score = Decimal('20')
+        result.second_test_score = Decimal('20')
+        result.save()
+        self.assertSummaryMatchesResults(self.student)
+
+        Result.objects.get(pk=result.pk).delete()
+        self.assertSummaryMatchesResults(self.student)
+
+        Result.objects.create(student=self.student, subject=result.subject, exam_score=Decimal('45'))
+        self.assertSummaryMatchesResults(self.student)
+
+        # Each term has its own row.
+        current = Term.objects.current()
+        last_term = Term.objects.for_date(current.starts_on - timedelta(days=1))
+        moved = Result.objects.create(student=self.student, subject=result.subject, term=last_term, exam_score=Decimal('80'))
+        self.assertSummaryMatchesResults(self.student)
+        moved.term = current
+        moved.subject = Subject.objects.create(name='Music', code='MUS')
+        moved.save()
+        self.assertSummaryMatchesResults(self.student)
+
+    def test_kept_in_step_by_bulk_paths(self):
+        students = list(self.classes[0].students.all())
+        Result.objects.filter(student__in=students).update(exam_score=Decimal('55'))
+        Result.objects.filter(student=students[1]).delete()
+        upsert_results([
+            {'student': students[2].pk, 'subject': subject.pk, 'exam_score': '70'}
+            for subject in Subject.objects.all()
+        ])
+        for student in students:
+            self.assertSummaryMatchesResults(student)
+
+    def test_overview_is_a_single_lookup(self):
+        url = reverse('student-overview', args=[self.student.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 1)
+        summary = StudentSummary.objects.get(student=self.student, term=Term.objects.current())
+        self.assertEqual(response.data['term'], summary.term_id)
+        self.assertEqual(response.data['result_count'], summary.result_count)
+        self.assertEqual(response.data['average'], float(summary.average))
+        self.assertEqual(sum(response.data['grades'].values()), summary.result_count)
+
+    def test_overview_covers_one_term(self):
+        current = Term.objects.current()
+        last_term = Term.objects.for_date(current.starts_on - timedelta(days=1))
+        subjects = Subject.objects.all()
+        Result.objects.bulk_create([
+            Result(student=self.student, subject=subject, term=last_term, exam_score=Decimal('70'))
+            for subject in subjects
+        ])
+        url = reverse('student-overview', args=[self.student.pk])
+        current_count = Result.objects.filter(student=self.student, term=current).count()
+        self.assertEqual(self.client.get(url).data['result_count'], current_count)
+        response = self.client.get(f'{url}?term={last_term.pk}')
+        self.assertEqual((response.data['term'], response.data['result_count']), (last_term.pk, len(subjects)))
+        self.assertEqual(response.data['subjects_passed'], len(subjects))
+        self.assertEqual(self.client.get(f'{url}?term=999999').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'{url}?term=all').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overview_for_a_student_without_results(self):
+        newcomer = CustomUser.objects.create(username='newcomer', email='newcomer@example.com', role='student')
+        response = self.client.get(reverse('student-overview', args=[newcomer.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['result_count'], 0)
+        self.assertIsNone(response.data['average'])
+        self.assertEqual(self.client.get(reverse('student-overview', args=[999999])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_overview_never_creates_or_reports_archived_terms(self):
+        url = reverse('student-overview', args=[self.student.pk])
+        last_term = Term.objects.for_date(Term.objects.current().starts_on - timedelta(days=1))
+        Result.objects.create(student=self.student, subject=Subject.objects.first(), term=last_term, exam_score=Decimal('70'))
+        call_command('archive_term', str(last_term.pk), stdout=StringIO())
+        self.assertEqual(self.client.get(f'{url}?term={last_term.pk}').status_code, status.HTTP_404_NOT_FOUND)
+        Result.objects.all().delete()
+        Term.objects.exclude(pk=last_term.pk).delete()
+        terms = Term.objects.count()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Term.objects.count(), terms)
+
+    def test_rebuild_command_repairs_drift(self):
+        StudentSummary.objects.filter(student=self.student).update(result_count=99, grade_a=42)
+        call_command('rebuild_transcripts', stdout=StringIO())
+        self.assertSummaryMatchesResults(self.student)
+
+
+class RankingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', email='admin@example.com', role='admin')
+        cls.maths = Subject.objects.create(name='Maths', code='MTH')
+        cls.physics = Subject.objects.create(name='Physics', code='PHY')
+        cls.school_class = Class.objects.create(name='JSS1', teacher=cls.admin)
+        cls.school_class.subjects.set([cls.maths, cls.physics])
+        cls.students = [
+            CustomUser.objects.create(username=f'rank{i}', email=f'rank{i}@example.com', role='student')
+            for i in range(5)
+        ]
+        cls.school_class.students.set(cls.students[:4])
+        for student, maths, physics in zip(cls.students, [90, 80, 80, 70, 95], [50, 90, 60, 70, 10]):
+            Result.objects.create(student=student, subject=cls.maths, exam_score=Decimal(maths))
+            Result.objects.create(student=student, subject=cls.physics, exam_score=Decimal(physics))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin)
+
+    def ranks(self, response):
+        return [(entry['student'], entry['rank'], entry['percentile']) for entry in response.data['results']]
+
+    def test_subject_ranking_shares_positions_on_ties(self):
+        response = self.client.get(f'/api/rankings/subjects/{self.maths.pk}/?class={self.school_class.pk}')
+        s = [student.pk for student in self.students]
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(self.ranks(response), [(s[0], 1, 100.0), (s[1], 2, 66.67), (s[2], 2, 66.67), (s[3], 3, 0.0)])
+        # Without ?class= the whole school is ranked.
+        response = self.client.get(f'/api/rankings/subjects/{self.maths.pk}/')
+        self.assertEqual(response.data['results'][0]['student'], s[4])
+
+    def test_class_ranking_uses_the_average_total(self):
+        response = self.client.get(f'/api/rankings/classes/{self.school_class.pk}/')
+        s = [student.pk for student in self.students]
+        self.assertEqual([(entry['student'], entry['average'], entry['rank']) for entry in response.data['results']],
+                         [(s[1], 85.0, 1), (s[0], 70.0, 2), (s[2], 70.0, 2), (s[3], 70.0, 2)])
+
+    def test_student_lookup_is_cached_until_the_cohort_changes(self):
+        url = f'/api/rankings/subjects/{self.maths.pk}/?student={self.students[3].pk}'
+        self.assertEqual(self.client.get(url).data['rank'], 4)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).data['rank'], 4)
+        self.assertEqual(len(queries), 0)
+
+        result = Result.objects.get(student=self.students[3], subject=self.maths)
+        result.exam_score = Decimal('99')
+        with self.captureOnCommitCallbacks(execute=True):
+            result.save()
+        self.assertEqual(self.client.get(url).data['rank'], 1)
+
+        # Results in other subjects leave the cached ranking alone.
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.filter(subject=self.physics).update(exam_score=Decimal('0'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), 0)
+
+    def test_ranking_read_before_commit_is_not_cached_as_current(self):
+        url = f'/api/rankings/subjects/{self.maths.pk}/?student={self.students[3].pk}'
+        self.assertEqual(self.client.get(url).data['rank'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_results([{'student': self.students[3].pk, 'subject': self.maths.pk, 'exam_score': '99'}])
+            # Stand-in for a concurrent request that still sees the old rows:
+            # the ranking it builds goes under the pre-commit version.
+            with mock.patch('results.rankings.subject_ranking', return_value=[]):
+                self.client.get(url)
+        self.assertEqual(self.client.get(url).data['rank'], 1)
+
+    def test_missing_cohorts_students_and_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/rankings/subjects/999/').status_code, status.HTTP_404_NOT_FOUND)
+        outsider = CustomUser.objects.create(username='outsider', email='outsider@example.com', role='student')
+        response = self.client.get(f'/api/rankings/classes/{self.school_class.pk}/?student={outsider.pk}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'/api/rankings/subjects/{self.maths.pk}/?limit=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'], REPLICA_CACHE_ALIAS='replicas')
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        tmp = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={
+            **settings.CACHES,
+            'replicas': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmp},
+        }))
+        self.factory = RequestFactory()
+        self.middleware = ReadReplicaMiddleware(self.get_response)
+        self.seen = {}
+
+    def get_response(self, request):
+        view = ResultViewSet.as_view({'get': 'list', 'post': 'create'}) if request.path == '/results/' else APIView.as_view()
+        self.middleware.process_view(request, view, (), {})
+        self.seen['result'] = router.db_for_read(Result)
+        self.seen['token'] = router.db_for_read(Token)
+        return HttpResponse()
+
+    def request(self, method, path='/results/', token='abc'):
+        request = getattr(self.factory, method)(path, HTTP_AUTHORIZATION=f'Token {token}')
+        self.middleware(request)
+        return self.seen
+
+    def synced(self, alias, at):
+        caches['replicas'].set(f'replica-synced:{alias}', at, None)
+
+    def test_flagged_safe_reads_use_a_replica(self):
+        self.assertEqual(self.request('get')['token'], 'default')
+        self.assertIn(self.request('get')['result'], ['replica1', 'replica2'])
+
+    def test_unflagged_views_and_writes_use_the_primary(self):
+        self.assertEqual(self.request('get', path='/other/')['result'], 'default')
+        self.assertEqual(self.request('post')['result'], 'default')
+
+    def test_reads_stay_on_the_primary_until_a_replica_syncs(self):
+        before = time.time()
+        self.request('post', token='writer')
+        self.synced('replica1', before)
+        self.assertEqual(self.request('get', token='writer')['result'], 'default')
+        self.assertIn(self.request('get', token='reader')['result'], ['replica1', 'replica2'])
+
+        self.synced('replica2', time.time())
+        for _ in range(5):
+            self.assertEqual(self.request('get', token='writer')['result'], 'replica2')
+        self.synced('replica1', time.time())
+        self.assertIn(self.request('get', token='writer')['result'], ['replica1', 'replica2'])
+
+    @override_settings(REPLICA_CACHE_ALIAS='default')
+    def test_process_local_cache_reads_the_primary(self):
+        with self.assertLogs('cadence_academy.replicas', 'WARNING'):
+            self.middleware = ReadReplicaMiddleware(self.get_response)
+        self.assertEqual(self.request('get')['result'], 'default')
+
+    def test_routing_ends_with_the_request(self):
+        self.request('get')
+        self.assertEqual(router.db_for_read(Result), 'default')
+
+
+class SyncReplicaTests(TransactionTestCase):
+    def test_copies_the_primary(self):
+        Subject.objects.create(name='Physics', code='PHY101')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'replica.sqlite3')
+            with mock.patch.dict(settings.DATABASES, {'replica1': {'NAME': path}}):
+                before = time.time()
+                sync_replica('replica1')
+            replica = sqlite3.connect(path)
+            try:
+                rows = replica.execute('SELECT code FROM results_subject').fetchall()
+            finally:
+                replica.close()
+        self.assertEqual(rows, [('PHY101',)])
+        self.assertGreaterEqual(cache.get('replica-synced:replica1'), before)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.user = CustomUser.objects.create(username='teacher', email='teacher@example.com', role='teacher')
+        subject = Subject.objects.create(name='Mathematics', code='MATH101')
+        Result.objects.create(student=self.user, subject=subject, exam_score=50)
+        self.client.force_authenticate(user=self.user)
+
+    def test_response_headers(self):
+        with override_settings(INSTRUMENTATION={'RESPONSE_HEADERS': True}):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/results/')
+        self.assertEqual(response['X-SQL-Queries'], str(len(queries)))
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=[\d.]+$')
+
+        with override_settings(INSTRUMENTATION={'RESPONSE_HEADERS': False}):
+            response = self.client.get('/api/results/')
+        self.assertNotIn('X-SQL-Queries', response)
+
+    def test_serializer_work_counts_as_serialization(self):
+        to_representation = Serializer.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(0.02)
+            return to_representation(serializer, instance)
+
+        # One result, rendered with its nested student and subject.
+        with mock.patch.object(Serializer, 'to_representation', autospec=True, side_effect=slow):
+            with override_settings(INSTRUMENTATION={'RESPONSE_HEADERS': True}):
+                response = self.client.get('/api/results/')
+        serialized = float(response['Server-Timing'].split('serialize;dur=')[1].split(',')[0])
+        self.assertGreaterEqual(serialized, 60)
+
+    def test_metrics_endpoint_exports_per_view_histograms(self):
+        self.client.get('/api/results/')
+        self.client.get('/api/results/')
+        self.client.get('/api/results/999999/')
+
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_404_NOT_FOUND)
+        with override_settings(INSTRUMENTATION={'METRICS_TOKEN': 'scrape'}):
+            self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE cadence_request_duration_seconds histogram', body)
+        self.assertIn('cadence_request_duration_seconds_count{view="result-list",method="GET"} 2', body)
+        self.assertIn('cadence_request_duration_seconds_bucket{view="result-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn('cadence_responses_total{view="result-detail",method="GET",status="4xx"} 1', body)
+        self.assertIn('cadence_request_sql_seconds_total{view="result-list",method="GET"}', body)
+
+    def test_streamed_responses_are_measured_until_closed(self):
+        response = self.client.get('/api/results/export/csv/')
+        self.assertNotIn('result-export', registry.export())
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        response.close()
+        self.assertTrue(queries)
+        body = registry.export()
+        self.assertIn('cadence_request_duration_seconds_count{view="result-export",method="GET"} 1', body)
+        self.assertIn(f'cadence_request_queries_sum{{view="result-export",method="GET"}} {len(queries)}', body)
+
+    def test_slow_requests_are_logged_with_their_queries(self):
+        with override_settings(INSTRUMENTATION={'SLOW_REQUEST_MS': 0}):
+            with self.assertLogs('cadence_academy.instrumentation', 'WARNING') as logs:
+                self.client.get('/api/results/')
+        self.assertIn('Slow request GET /api/results/ (result-list)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram((0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.count, 4)
+
+
+class SeedSchoolTests(APITestCase):
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed_school', '--students', '50', '--teachers', '3', '--admins', '1', '--subjects', '6',
+                     '--class-size', '20', '--subjects-per-class', '4', *args, stdout=out)
+        return out.getvalue()
+
+    def test_seeds_a_consistent_school(self):
+        self.assertIn('Seeded 50 students, 3 teachers, 1 admins, 3 classes and 200 results', self.seed())
+        students = CustomUser.objects.filter(role='student')
+        self.assertEqual(students.count(), 50)
+        self.assertEqual(CustomUser.objects.filter(profile__isnull=True).count(), 0)
+        self.assertEqual(HomeClass.objects.count(), 3)
+        self.assertEqual(Class.students.through.objects.count(), 50)
+        self.assertEqual(Class.subjects.through.objects.count(), 12)
+        self.assertTrue(students.first().check_password('cadence-seed'))
+
+        # Stored totals and grades match what Result.save() would compute.
+        for result in Result.objects.all()[:50]:
+            self.assertEqual(result.total, result.total_score())
+            self.assertEqual(result.grade, calculate_grade(result.total))
+        self.assertEqual(StudentSummary.objects.count(), 50)
+        summary = StudentSummary.objects.get(student=students.first())
+        self.assertEqual(summary.result_count, 4)
+
+    def test_same_seed_same_scores_and_prefixes_required_to_reseed(self):
+        self.seed('--seed', '7')
+        first = list(Result.objects.order_by('pk').values_list('total', flat=True))
+        with self.assertRaisesMessage(CommandError, 'already been seeded'):
+            self.seed('--seed', '7')
+        self.seed('--seed', '7', '--prefix', 'b')
+        second = list(Result.objects.filter(student__username__startswith='b').order_by('pk').values_list('total', flat=True))
+        self.assertEqual(first, second)
+
+
+class TermTests(APITestCase):
+    def test_calendar_terms(self):
+        self.assertEqual(term_bounds(date(2024, 9, 1)), ('2024/2025 First Term', date(2024, 9, 1), date(2025, 1, 5)))
+        self.assertEqual(term_bounds(date(2025, 1, 5)), ('2024/2025 First Term', date(2024, 9, 1), date(2025, 1, 5)))
+        self.assertEqual(term_bounds(date(2025, 4, 21)), ('2024/2025 Second Term', date(2025, 1, 6), date(2025, 4, 21)))
+        self.assertEqual(term_bounds(date(2025, 8, 31)), ('2024/2025 Third Term', date(2025, 4, 22), date(2025, 8, 31)))
+
+    def test_results_are_written_to_the_current_term(self):
+        student = CustomUser.objects.create(username='termed', email='termed@example.com', role='student')
+        subject = Subject.objects.create(name='Maths', code='MTH')
+        result = Result.objects.create(student=student, subject=subject, exam_score=Decimal('50'))
+        self.assertEqual(result.term, Term.objects.current())
+        self.assertTrue(result.term.starts_on <= timezone.localdate() <= result.term.ends_on)
+        # The same student and subject can have a result in every term.
+        last_term = Term.objects.for_date(result.term.starts_on - timedelta(days=1))
+        Result.objects.create(student=student, subject=subject, term=last_term, exam_score=Decimal('60'))
+        self.assertEqual(Term.objects.count(), 2)
+
+
+class TermArchiveTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_school', '--students', '20', '--teachers', '2', '--admins', '1', '--subjects', '4',
+                     '--class-size', '10', '--subjects-per-class', '3', '--terms', '2', stdout=StringIO())
+        cls.admin = CustomUser.objects.get(role='admin')
+        cls.last_term, cls.current_term = Term.objects.all()
+        cls.subject = Subject.objects.order_by('pk').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin)
+
+    def ids(self, query):
+        response = self.client.get(f'/api/results/?page_size=500&{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return {row['id'] for row in response.data['results']}
+
+    def archive(self, *args):
+        call_command('archive_term', *args, stdout=StringIO())
+
+    def test_lists_default_to_the_current_term(self):
+        current = set(Result.objects.filter(term=self.current_term).values_list('pk', flat=True))
+        last = set(Result.objects.filter(term=self.last_term).values_list('pk', flat=True))
+        self.assertEqual(len(current), 60)
+        self.assertEqual(self.ids(''), current)
+        self.assertEqual(self.ids(f'term={self.last_term.pk}'), last)
+        self.assertEqual(self.ids('term=all'), current | last)
+        response = self.client.get(f'/api/results/statistics/?subject={self.subject.pk}')
+        self.assertEqual(response.data['count'], Result.objects.filter(term=self.current_term, subject=self.subject).count())
+
+    def test_detail_lookups_find_results_of_any_term(self):
+        result = Result.objects.filter(term=self.last_term).order_by('pk').first()
+        response = self.client.get(f'/api/results/{result.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], result.pk)
+        response = self.client.patch(f'/api/results/{result.pk}/', {'exam_score': '42'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        result.refresh_from_db()
+        self.assertEqual((result.exam_score, result.term), (42, self.last_term))
+        # An explicit term still narrows the lookup.
+        response = self.client.get(f'/api/results/{result.pk}/?term=current')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.delete(f'/api/results/{result.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Result.objects.filter(pk=result.pk).exists())
+
+    def test_bulk_upsert_writes_the_current_term(self):
+        result = Result.objects.filter(term=self.last_term).first()
+        row = {'student': result.student_id, 'subject': result.subject_id, 'exam_score': '10'}
+        response = self.client.post('/api/results/bulk/', [row], format='json')
+        self.assertEqual(response.data, {'created': 0, 'updated': 1})
+        self.assertEqual(Result.objects.get(pk=result.pk).exam_score, result.exam_score)
+        self.assertEqual(Result.objects.get(student=result.student, subject=result.subject, term=self.current_term).exam_score, 10)
+
+    def test_archive_moves_closed_terms_and_keeps_them_queryable(self):
+        with self.assertRaisesMessage(CommandError, 'has not closed yet'):
+            self.archive(str(self.current_term.pk))
+        last = set(Result.objects.filter(term=self.last_term).values_list('pk', flat=True))
+        ranking = self.client.get(f'/api/rankings/subjects/{self.subject.pk}/?term={self.last_term.pk}').data
+
+        self.archive('--all-closed', '--batch-size', '7')
+        self.assertFalse(Result.objects.filter(term=self.last_term).exists())
+        self.assertEqual(set(ArchivedResult.objects.values_list('pk', flat=True)), last)
+        self.last_term.refresh_from_db()
+        self.assertIsNotNone(self.last_term.archived_at)
+        # Summaries now cover the live terms only.
+        self.assertEqual(set(StudentSummary.objects.values_list('result_count', flat=True)), {3})
+
+        self.assertEqual(self.ids(f'term={self.last_term.pk}'), set())
+        self.assertEqual(self.ids('archived=true'), last)
+        response = self.client.get(f'/api/results/{min(last)}/?archived=true')
+        self.assertEqual(response.data['term'], self.last_term.pk)
+        archived = self.client.get(f'/api/rankings/subjects/{self.subject.pk}/?term={self.last_term.pk}&archived=true')
+        self.assertEqual(archived.data, ranking)
+        self.assertEqual(self.client.get(f'/api/results/statistics/?archived=true&subject={self.subject.pk}').data['count'],
+                         ArchivedResult.objects.filter(subject=self.subject).count())
+
+        response = self.client.delete(f'/api/results/{min(last)}/?archived=true')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/results/?archived=maybe').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.archive(self.last_term.name, '--restore')
+        self.assertFalse(ArchivedResult.objects.exists())
+        self.assertEqual(set(Result.objects.filter(term=self.last_term).values_list('pk', flat=True)), last)
+        self.assertEqual(set(StudentSummary.objects.values_list('result_count', flat=True)), {3})
+        self.assertEqual(StudentSummary.objects.filter(term=self.last_term).count(), 20)
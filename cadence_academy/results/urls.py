@@ -1,12 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SubjectViewSet, ClassViewSet, ResultViewSet
+from .views import SubjectViewSet, ClassViewSet, ResultViewSet, TermViewSet, StudentOverviewView, SubjectRankingView, ClassRankingView, SearchView
 
 router = DefaultRouter()
 router.register(r'subjects', SubjectViewSet)
 router.register(r'classes', ClassViewSet)
 router.register(r'results', ResultViewSet)
+router.register(r'terms', TermViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('students/<int:student_id>/overview/', StudentOverviewView.as_view(), name='student-overview'),
+    path('rankings/subjects/<int:pk>/', SubjectRankingView.as_view(), name='subject-ranking'),
+    path('rankings/classes/<int:pk>/', ClassRankingView.as_view(), name='class-ranking'),
+    path('search/', SearchView.as_view(), name='search'),
 ]
\ No newline at end of file
@@ -1,23 +1,295 @@
-from rest_framework import viewsets
-from .models import Subject, Class, Result
-from .serializers import SubjectSerializer, ClassSerializer, ResultSerializer
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import generics, viewsets, status
+from rest_framework.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.http import StreamingHttpResponse
+from django.db import router
+from .models import Subject, Class, Result, StudentSummary, Term, ArchivedResult
+from accounts.models import CustomUser
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from .serializers import SubjectSerializer, ClassSerializer, ResultSerializer, StudentSummarySerializer, TermSerializer
+from .bulk import upsert_results
+from .export import EXPORT_FORMATS, export_rows
+from .rankings import get_class_ranking, get_subject_ranking
+from .analytics import HISTOGRAM_BINS, MAX_HISTOGRAM_BINS, result_statistics
+from .filters import ResultFilterBackend, archived_requested, filter_results
+from .search import MIN_QUERY_LENGTH, TARGETS, search
+from accounts.permissions import IsAdminUser
+from accounts.serializers import CustomUserSerializer
+from accounts.pagination import NewestFirstCursorPagination
+from accounts.mixins import RelatedFieldsQuerysetMixin, ConditionalGetMixin, field_requested
+from accounts.caching import VersionedResponseCacheMixin
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.views import APIView
+from django.conf import settings
+from operator import attrgetter
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(VersionedResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = (Subject,)
 
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(RelatedFieldsQuerysetMixin, viewsets.ModelViewSet):
     queryset = Class.objects.all()
+    select_related_fields = {'teacher': 'teacher'}
+    prefetch_related_fields = {'students': 'students', 'subjects': 'subjects'}
     serializer_class = ClassSerializer
     permission_classes = [IsAuthenticated]
+    use_read_replica = True
 
-class ResultViewSet(viewsets.ModelViewSet):
+class TermViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Term.objects.all()
+    serializer_class = TermSerializer
+    permission_classes = [IsAuthenticated]
+
+class ResultViewSet(ConditionalGetMixin, RelatedFieldsQuerysetMixin, viewsets.ModelViewSet):
     queryset = Result.objects.all()
+    select_related_fields = {'student': 'student', 'subject': 'subject'}
     serializer_class = ResultSerializer
     permission_classes = [IsAuthenticated]
-    
+    filter_backends = [ResultFilterBackend]
+    # Newest first. Keyed on id rather than date_recorded because a bulk
+    # upsert stamps a whole sheet with the same date_recorded.
+    pagination_class = NewestFirstCursorPagination
+    use_read_replica = True
+
+    @cached_property
+    def archived(self):
+        # ?archived=true reads archived terms instead of the live table.
+        try:
+            archived = archived_requested(self.request.query_params)
+        except ValueError as exc:
+            raise ValidationError({'archived': [str(exc)]})
+        if archived and self.request.method not in SAFE_METHODS:
+            raise ValidationError({'archived': ['Archived results are read-only.']})
+        return archived
+
+    def results(self):
+        return (ArchivedResult if self.archived else Result).objects.all()
+
+    def get_queryset(self):
+        self.queryset = self.results()
+        return super().get_queryset()
+
+    def stamp_fields(self, request):
+        # The embedded student and subject count as part of each row.
+        serializer_class = self.get_serializer_class()
+        return ['updated_at'] + [
+            f'{name}__updated_at' for name in ('student', 'subject')
+            if field_requested(request, serializer_class, name)
+        ]
+
+    def fingerprint(self, rows, fields):
+        return ';'.join(':'.join([str(row['id']), *(row[name].isoformat() for name in fields)]) for row in rows)
+
+    def page_validators(self, rows, fields):
+        # Scoped to the page: its ids catch deletions, its stamps edits, and
+        # the links whether rows appeared or went on either side of it. No
+        # Last-Modified, since a deletion would not move it.
+        paginator = self.paginator
+        links = f'{paginator.has_previous}:{paginator.has_next}'
+        return None, f'{links}|{self.fingerprint(rows, fields)}'
+
+    def get_validators(self, request, *args, **kwargs):
+        # The page (or object) the response would contain, as values only.
+        fields = self.stamp_fields(request)
+        queryset = self.filter_queryset(self.results()).values('id', *fields)
+        if 'pk' in kwargs:
+            row = queryset.filter(pk=kwargs['pk']).first()
+            if row is None:
+                return None
+            return max(row[name] for name in fields), self.fingerprint([row], fields)
+        return self.page_validators(self.paginate_queryset(queryset), fields)
+
+    def response_validators(self, request, response, *args, **kwargs):
+        # A list response already loaded its page, so its validators cost no
+        # query; a detail response takes the one-row lookup above.
+        if 'pk' in kwargs:
+            return self.get_validators(request, *args, **kwargs)
+        fields = self.stamp_fields(request)
+        rows = [
+            {'id': result.pk, **{name: attrgetter(name.replace('__', '.'))(result) for name in fields}}
+            for result in self.paginator.page
+        ]
+        return self.page_validators(rows, fields)
+
     def perform_create(self, serializer):
         # Additional logic here if needed
         serializer.save()
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_upsert(self, request):
+        # Accepts either a bare list of rows or {"results": [...]}.
+        rows = request.data.get('results') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({'detail': 'Expected a list of results.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = upsert_results(rows)
+        if summary.errors:
+            return Response({'errors': summary.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': summary.created, 'updated': summary.updated}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>csv|ndjson)')
+    def export(self, request, export_format):
+        content_type, extension = EXPORT_FORMATS[export_format]
+        # The body is streamed after the view returns, so bind the queryset to
+        # this request's read database now.
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.using(router.db_for_read(queryset.model))
+        response = StreamingHttpResponse(export_rows(queryset, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="results.{extension}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def statistics(self, request):
+        # The list filters (?class=&subject=&date_from=...&archived=) plus ?bins=.
+        queryset, errors = filter_results(self.results(), request.query_params)
+        try:
+            bins = int(request.query_params.get('bins', HISTOGRAM_BINS))
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= MAX_HISTOGRAM_BINS:
+            errors['bins'] = [f'Must be an integer between 1 and {MAX_HISTOGRAM_BINS}.']
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result_statistics(queryset, bins=bins))
+
+class StudentOverviewView(generics.RetrieveAPIView):
+    """
+    A student's totals for the current term, or for ?term=<id>. Archived
+    terms are not summarised and return 404.
+    """
+    queryset = StudentSummary.objects.all()
+    serializer_class = StudentSummarySerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'student_id'
+    use_read_replica = True
+
+    @cached_property
+    def term(self):
+        value = (self.request.query_params.get('term') or 'current').strip().lower()
+        if value == 'current':
+            return value
+        try:
+            term = int(value)
+        except ValueError:
+            term = 0
+        if term < 1:
+            raise ValidationError({'term': ['Use a term id or "current".']})
+        return term
+
+    def get_queryset(self):
+        term = Term.objects.current_id() if self.term == 'current' else self.term
+        return super().get_queryset().filter(term_id=term, term__archived_at__isnull=True)
+
+    def get_object(self):
+        # A single lookup on (student, term); students without results in
+        # the term have no row.
+        try:
+            return super().get_object()
+        except Http404:
+            if not CustomUser.objects.filter(pk=self.kwargs['student_id']).exists():
+                raise
+            # Read-only: a GET never creates the current term, and archived
+            # terms have no summaries to report.
+            if self.term == 'current':
+                term = Term.objects.containing(timezone.localdate()).filter(archived_at__isnull=True).first()
+                if term is None:
+                    raise
+            else:
+                term = get_object_or_404(Term, pk=self.term, archived_at__isnull=True)
+            return StudentSummary(student_id=self.kwargs['student_id'], term=term)
+
+
+def _int_param(request, name, default=None, minimum=0, maximum=None):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    value = int(value)
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError
+    return value
+
+class RankingView(APIView):
+    """
+    ?student=<id> returns that student's entry; otherwise ?limit= and
+    ?offset= page through the ranking. Rankings cover the current term
+    unless ?term=<id> picks another, read from the archive with
+    ?archived=true. They are cached until a result in the cohort changes.
+    """
+    permission_classes = [IsAuthenticated]
+    cohort_model = None
+
+    def get_ranking(self, request, pk, term, archived):
+        raise NotImplementedError
+
+    def get(self, request, pk):
+        try:
+            term = _int_param(request, 'term', minimum=1)
+            ranking = self.get_ranking(request, pk, term, archived_requested(request.query_params))
+            student = _int_param(request, 'student', minimum=1)
+            limit = _int_param(request, 'limit', settings.REST_FRAMEWORK['PAGE_SIZE'], 1, settings.MAX_PAGE_SIZE)
+            offset = _int_param(request, 'offset', 0)
+        except ValueError:
+            return Response({'detail': 'Invalid query parameter.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = ranking['entries']
+        if not entries and not self.cohort_model.objects.filter(pk=pk).exists():
+            raise Http404
+        if student is not None:
+            position = ranking['positions'].get(student)
+            if position is None:
+                raise Http404
+            return Response({'count': len(entries), **entries[position]})
+        return Response({'count': len(entries), 'results': entries[offset:offset + limit]})
+
+class SubjectRankingView(RankingView):
+    cohort_model = Subject
+
+    def get_ranking(self, request, pk, term, archived):
+        # ?class=<id> ranks the subject within one class ("position in class").
+        return get_subject_ranking(pk, _int_param(request, 'class', minimum=1), term, archived)
+
+class ClassRankingView(RankingView):
+    cohort_model = Class
+
+    def get_ranking(self, request, pk, term, archived):
+        return get_class_ranking(pk, term, archived)
+
+class SearchView(APIView):
+    """
+    ?q= searches users (username, email, names, bio), classes and subjects
+    by word prefix, best matches first. ?type= narrows to one of them,
+    ?role= to users of one role, and ?limit= caps each list.
+    """
+    permission_classes = [IsAdminUser]
+    serializers = {'users': CustomUserSerializer, 'classes': ClassSerializer, 'subjects': SubjectSerializer}
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        kind = request.query_params.get('type')
+        role = request.query_params.get('role')
+        errors = {}
+        if len(query) < MIN_QUERY_LENGTH:
+            errors['q'] = [f'Ensure this value has at least {MIN_QUERY_LENGTH} characters.']
+        if kind not in (None, '', *TARGETS):
+            errors['type'] = [f"Select one of {', '.join(TARGETS)}."]
+        if role not in (None, '', *dict(CustomUser.ROLE_CHOICES)):
+            errors['role'] = [f"Select one of {', '.join(dict(CustomUser.ROLE_CHOICES))}."]
+        try:
+            limit = _int_param(request, 'limit', settings.REST_FRAMEWORK['PAGE_SIZE'], 1, settings.MAX_PAGE_SIZE)
+        except ValueError:
+            errors['limit'] = [f'Ensure this value is between 1 and {settings.MAX_PAGE_SIZE}.']
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = {'query': query}
+        for name in [kind] if kind else TARGETS:
+            filters = {'role': role} if role and name == 'users' else None
+            objects = search(name, query, limit=limit, filters=filters)
+            data[name] = self.serializers[name](objects, many=True, context={'request': request}).data
+        return Response(data)